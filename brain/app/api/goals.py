@@ -77,7 +77,7 @@ async def get_vision(user: User = Depends(require_user)):
     try:
         service = get_memory_service()
         # 1. 寻找 Vision 节点 (User --[OWNS]--> Vision)
-        with service.graph_store._get_conn() as conn:
+        with service.graph_store._get_conn(write=False) as conn:
             row = conn.execute("""
                 SELECT n.* FROM nodes n
                 JOIN edges e ON n.id = e.target
@@ -107,7 +107,7 @@ async def list_goals(user: User = Depends(require_user)):
         service = get_memory_service()
         goals = []
         
-        with service.graph_store._get_conn() as conn:
+        with service.graph_store._get_conn(write=False) as conn:
             # 1. 尝试获取 Vision 节点
             vision_row = conn.execute("""
                 SELECT target FROM edges 
@@ -317,7 +317,7 @@ async def list_goal_projects(goal_id: str, user: User = Depends(require_user)):
     try:
         service = get_memory_service()
         projects = []
-        with service.graph_store._get_conn() as conn:
+        with service.graph_store._get_conn(write=False) as conn:
             query = """
                 SELECT n.* FROM nodes n
                 JOIN edges e ON n.id = e.target
@@ -357,7 +357,7 @@ async def list_project_tasks(project_id: str, user: User = Depends(require_user)
     try:
         service = get_memory_service()
         tasks = []
-        with service.graph_store._get_conn() as conn:
+        with service.graph_store._get_conn(write=False) as conn:
             query = """
                 SELECT n.* FROM nodes n
                 JOIN edges e ON n.id = e.target
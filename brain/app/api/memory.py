@@ -3,6 +3,7 @@
 处理知识图谱的查询、创建和可视化
 """
 from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import uuid
@@ -18,8 +19,9 @@ from ..models.user import User
 from .auth import require_user
 
 from ..services.memory.memory_service import get_memory_service
+from ..services.memory.graph_store import _UPSERT_NODE_SQL
 from ..services.ingestion.service import get_ingestion_service
-from ..core.config import UPLOAD_DIR
+from ..core.config import UPLOAD_DIR, MemoryConfig
 
 # 移除 ThreadPoolExecutor，不再需要
 
@@ -122,28 +124,47 @@ async def start_training(
 async def _process_batch_training(task_id: str, filenames: List[str], user_id: str):
     """批量处理训练任务"""
     total_files = len(filenames)
-    try:
-        for i, filename in enumerate(filenames):
-            # 更新总体进度
-            base_progress = int((i / total_files) * 100)
+    # 各文件的进度 (0-100)，总体进度取平均值，并发处理时不会来回跳动
+    file_progress = [0] * total_files
+    # 文件之间互不依赖，且耗时主要在线程池解析/向量化与 DeepSeek 网络请求上，
+    # 按上限并发处理；SQLite 与 Chroma 的写入在存储层各自串行
+    semaphore = asyncio.Semaphore(MemoryConfig.TRAIN_FILE_CONCURRENCY)
+    # 第一个出错的文件名，失败信息指向它而不是最后更新进度的文件
+    failed_files: List[str] = []
+
+    async def process(i: int, filename: str):
+        async with semaphore:
             _tasks_db[task_id]["message"] = f"正在处理第 {i+1}/{total_files} 个文件: {filename}"
-            _tasks_db[task_id]["progress"] = base_progress
-            
-            # 处理单个文件
-            await _process_single_file_in_batch(task_id, filename, user_id, base_progress, 100 // total_files)
-            
+            try:
+                await _process_single_file_in_batch(task_id, filename, user_id, i, file_progress)
+            except Exception:
+                failed_files.append(filename)
+                raise
+            file_progress[i] = 100
+            _tasks_db[task_id]["progress"] = sum(file_progress) // total_files
+
+    tasks = [asyncio.create_task(process(i, filename)) for i, filename in enumerate(filenames)]
+    try:
+        await asyncio.gather(*tasks)
+
         _tasks_db[task_id]["status"] = "completed"
         _tasks_db[task_id]["progress"] = 100
         _tasks_db[task_id]["message"] = "批量训练全部完成"
         
     except Exception as e:
-        logger.error(f"Batch training task {task_id} failed: {str(e)}")
+        # gather 不会取消其余文件：先标记失败 (进度回调据此停止更新)，再取消并等待仍在运行的任务退出，
+        # 避免已中断的任务继续改写进度或写入图谱与向量库
         _tasks_db[task_id]["status"] = "failed"
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        failed = failed_files[0] if failed_files else ""
+        logger.error(f"Batch training task {task_id} failed on {failed}: {str(e)}")
         _tasks_db[task_id]["error"] = str(e)
-        _tasks_db[task_id]["message"] = f"批量训练中断: {str(e)}"
+        _tasks_db[task_id]["message"] = f"批量训练中断 [{failed}]: {str(e)}"
 
-async def _process_single_file_in_batch(task_id: str, filename: str, user_id: str, base_progress: int, weight: int):
-    """在批量任务中处理单个文件"""
+async def _process_single_file_in_batch(task_id: str, filename: str, user_id: str, index: int, file_progress: List[int]):
+    """在批量任务中处理单个文件 (file_progress[index] 记录本文件进度)"""
     service = get_ingestion_service()
     
     # 查找文件路径
@@ -163,8 +184,11 @@ async def _process_single_file_in_batch(task_id: str, filename: str, user_id: st
 
     # 进度回调
     def on_progress(p, msg):
-        current_p = base_progress + int((p / 100) * weight)
-        _tasks_db[task_id].update({"progress": current_p, "message": f"[{filename}] {msg}"})
+        # 批量任务已失败时不再更新 (回调可能来自尚未结束的解析线程)
+        if _tasks_db[task_id].get("status") == "failed":
+            return
+        file_progress[index] = p
+        _tasks_db[task_id].update({"progress": sum(file_progress) // len(file_progress), "message": f"[{filename}] {msg}"})
 
     # 执行训练 (异步)
     result = await service.ingest_file(str(file_path), user_id, on_progress)
@@ -217,7 +241,7 @@ async def get_task_status(
 
 # ============ API 端点 ============
 
-@router.get("/graph", response_model=MemoryGraphData)
+@router.get("/graph", response_model=MemoryGraphData, response_class=ORJSONResponse)
 async def get_graph(
     types: Optional[str] = Query(default=None, description="节点类型过滤，逗号分隔"),
     view_type: str = Query(default="global", description="图谱视图类型: global, strategic, people"),
@@ -232,7 +256,9 @@ async def get_graph(
         service = get_memory_service()
         # 显式传递参数，解决某些环境下 run_in_executor 丢失参数的问题
         graph_data = await asyncio.get_event_loop().run_in_executor(
-            None, lambda: service.graph_store.get_all_graph_data(user_id=user.id, view_type=view_type)
+            None, lambda: service.graph_store.get_all_graph_data(
+                user_id=user.id, view_type=view_type, include_details=False
+            )
         )
         
         # [Strategic Brain] 确保默认节点存在 (Self & Vision)
@@ -248,7 +274,9 @@ async def get_graph(
             )
             # 重新获取数据
             graph_data = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: service.graph_store.get_all_graph_data(user_id=user.id, view_type=view_type)
+                None, lambda: service.graph_store.get_all_graph_data(
+                    user_id=user.id, view_type=view_type, include_details=False
+                )
             )
         
         # 转换为 Pydantic 模型
@@ -300,17 +328,34 @@ async def get_graph(
             except Exception as e:
                 logger.warning(f"关系转换失败: {l}, {e}")
 
-        return MemoryGraphData(
+        graph = MemoryGraphData(
             nodes=nodes,
             links=links,
             total_nodes=len(nodes),
             total_links=len(links),
             type_counts=type_counts
         )
+        # 模型已在上面逐个构造校验过，成功与失败路径都直接返回 ORJSONResponse，
+        # 跳过 FastAPI 按 response_model 的二次校验与 jsonable_encoder (response_model 仅用于接口文档)
+        return ORJSONResponse(graph.model_dump())
     except Exception as e:
         logger.error(f"获取图谱数据失败: {e}")
         # 即使失败也返回空数据结构，而不是 500
-        return MemoryGraphData(nodes=[], links=[], total_nodes=0, total_links=0, type_counts={})
+        return ORJSONResponse(MemoryGraphData(nodes=[], links=[], total_nodes=0, total_links=0, type_counts={}).model_dump())
+
+
+@router.get("/graph/columns", response_class=ORJSONResponse)
+async def get_graph_columns(
+    view_type: str = Query(default="global", description="图谱视图类型: global, strategic, people, staging"),
+    user: User = Depends(require_user)
+):
+    """
+    列式图谱数据 (每个字段一个数组)，供大图可视化使用，跳过逐节点的模型转换
+    """
+    service = get_memory_service()
+    return await asyncio.get_event_loop().run_in_executor(
+        None, lambda: service.graph_store.get_graph_columns(user_id=user.id, view_type=view_type)
+    )
 
 
 @router.post("/search", response_model=List[MemorySearchResult])
@@ -381,7 +426,7 @@ async def get_pending_memories(user: User = Depends(require_user)):
     service = get_memory_service()
     try:
         # 查询 status='pending' 的节点
-        with service.graph_store._get_conn() as conn:
+        with service.graph_store._get_conn(write=False) as conn:
             # 兼容性处理：如果表没有 status 列，这里会报错，需要 try-catch
             try:
                 rows = conn.execute(
@@ -449,7 +494,7 @@ async def get_nodes(
         else:
             # 如果没传类型，默认获取全部（慎用）
             graph_data = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: service.graph_store.get_all_graph_data(user_id=user.id)
+                None, lambda: service.graph_store.get_all_graph_data(user_id=user.id, include_details=False)
             )
             nodes = graph_data.get("nodes", [])
             
@@ -550,10 +595,11 @@ async def commit_staging_memories(
                 elif ntype == "Self":
                     nid = user.id
                 
-                conn.execute("""
-                    INSERT OR REPLACE INTO nodes (id, user_id, type, name, content, attributes, source_file)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (nid, user.id, ntype, n["name"], n["content"], n["attributes"], n["source_file"]))
+                # 原地更新已存在的节点，保留 created_at 与 concept_vector；未提供的列取表默认值
+                conn.execute(_UPSERT_NODE_SQL, (
+                    nid, user.id, ntype, n["name"], n["content"], n["attributes"],
+                    "confirmed", None, None, None, 0.0, n["source_file"]
+                ))
             
             # 3. 获取相关的边
             # 这里简单起见，只要源和目标都在已确认节点中的边都入库
@@ -698,7 +744,7 @@ async def get_file_lineage(
     """
     service = get_memory_service()
     try:
-        with service.graph_store._get_conn() as conn:
+        with service.graph_store._get_conn(write=False) as conn:
             # 1. 查询暂存区节点
             staging_nodes = conn.execute(
                 "SELECT id, name, type, 'staging' as source_table FROM staging_nodes WHERE user_id = ? AND source_file = ?",
@@ -73,6 +73,8 @@ class MemoryConfig:
     VECTOR_BATCH_SIZE = 50
     CHUNK_SIZE = 4000
     CHUNK_OVERLAP = 400
+    # 批量训练时同时处理的文件数 (受 DeepSeek 并发与向量模型内存限制)
+    TRAIN_FILE_CONCURRENCY = 3
     
     # 核心注意力关键词
     CORE_KEYWORDS = [
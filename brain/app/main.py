@@ -4,6 +4,7 @@ FastAPI 主应用入口
 """
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from langchain_core.messages import HumanMessage
@@ -79,7 +80,8 @@ app = FastAPI(
     version="2.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan # 注册生命周期
+    lifespan=lifespan, # 注册生命周期
+    default_response_class=ORJSONResponse # 默认用 orjson 序列化响应，大体积图谱/列表返回更快
 )
 
 app.add_middleware(
@@ -153,7 +153,7 @@ class EvolutionService:
         
         logs = []
         try:
-            with self.memory_service.graph_store._get_conn() as conn:
+            with self.memory_service.graph_store._get_conn(write=False) as conn:
                 # 查询昨日的所有 Log 节点
                 # 注意：timestamp 存储格式可能不一致，这里做简单模糊匹配
                 cursor = conn.execute(
@@ -3,11 +3,11 @@ from pathlib import Path
 import logging
 import asyncio
 import uuid
-import json
 from datetime import datetime
 
 from app.services.memory.memory_service import get_memory_service
 from app.services.memory.file_processor import FileProcessor
+from app.services.memory.graph_store import _UPSERT_NODE_SQL, _dumps
 from app.core.config import DATA_DIR, MemoryConfig
 
 logger = logging.getLogger(__name__)
@@ -91,7 +91,7 @@ class IngestionService:
         if progress_callback: progress_callback(60, "正在整理结构化数据...")
         all_nodes = []
         all_edges = []
-        vectors_to_add = [] # (id, text, metadata)
+        vectors_to_add = {} # id -> (text, metadata)，同一节点在多个切片中出现时只向量化一次
         
         # ID 映射表 (DeepSeek ID -> Stable ID)
         id_map = {}
@@ -134,11 +134,10 @@ class IngestionService:
                 
                 # 筛选需要向量化的节点 (Goal, Project)
                 if node.get("type") in ["Goal", "Project"]:
-                    vectors_to_add.append({
-                        "id": stable_id,
-                        "text": node.get("content") or name,
-                        "metadata": {"name": name, "type": node.get("type"), "user_id": user_id}
-                    })
+                    vectors_to_add[stable_id] = (
+                        node.get("content") or name,
+                        {"name": name, "type": node.get("type"), "user_id": user_id}
+                    )
             
             # 第二遍：更新 Edges 的 Source/Target
             for edge in edges:
@@ -157,39 +156,36 @@ class IngestionService:
                 })
 
         # 3. 向量化 & 存储向量
-        # A. 节点向量化
-        if vectors_to_add:
-            if progress_callback: progress_callback(70, f"正在向量化 {len(vectors_to_add)} 个关键节点...")
-            logger.info(f"正在向量化 {len(vectors_to_add)} 个关键节点...")
-            texts = [v["text"] for v in vectors_to_add]
-            ids = [v["id"] for v in vectors_to_add]
-            metadatas = [v["metadata"] for v in vectors_to_add]
-            
-            embeddings = await asyncio.to_thread(
-                self.memory_service.neural_processor.embed_batch, 
-                texts
-            )
-            
-            await asyncio.to_thread(
-                self.memory_service.vector_store.add_documents,
-                texts, metadatas, ids, embeddings
-            )
-
-        # B. 原始切片向量化 (保持全文检索能力)
-        if chunks:
-            if progress_callback: progress_callback(80, "正在向量化原始文本切片...")
-            logger.info("正在向量化原始切片...")
-            chunk_embeddings = await asyncio.to_thread(
+        # 关键节点与原始切片合并为一次 embed_batch，模型只做一轮批量前向，再按位置拆分
+        ids = list(vectors_to_add)
+        texts = [vectors_to_add[i][0] for i in ids]
+        if texts or chunks:
+            if progress_callback: progress_callback(70, f"正在向量化 {len(texts)} 个关键节点与 {len(chunks)} 个原始切片...")
+            logger.info(f"正在向量化 {len(texts)} 个关键节点与 {len(chunks)} 个原始切片...")
+            all_embeddings = await asyncio.to_thread(
                 self.memory_service.neural_processor.embed_batch,
-                chunks
-            )
-            chunk_ids = [f"chunk_{uuid.uuid4().hex[:8]}" for _ in chunks]
-            chunk_metadatas = [metadata] * len(chunks)
-            
-            await asyncio.to_thread(
-                self.memory_service.vector_store.add_documents,
-                chunks, chunk_metadatas, chunk_ids, chunk_embeddings
+                texts + chunks
             )
+            embeddings, chunk_embeddings = all_embeddings[:len(texts)], all_embeddings[len(texts):]
+
+            # A. 节点向量
+            if texts:
+                metadatas = [vectors_to_add[i][1] for i in ids]
+                await asyncio.to_thread(
+                    self.memory_service.vector_store.add_documents,
+                    texts, metadatas, ids, embeddings
+                )
+
+            # B. 原始切片向量 (保持全文检索能力)
+            if chunks:
+                if progress_callback: progress_callback(80, "正在存储原始文本切片向量...")
+                chunk_ids = [f"chunk_{uuid.uuid4().hex[:8]}" for _ in chunks]
+                chunk_metadatas = [metadata] * len(chunks)
+                
+                await asyncio.to_thread(
+                    self.memory_service.vector_store.add_documents,
+                    chunks, chunk_metadatas, chunk_ids, chunk_embeddings
+                )
 
         # 4. 图谱存储 (Nodes & Edges)
         if progress_callback: progress_callback(90, f"正在写入图谱: {len(all_nodes)} 节点, {len(all_edges)} 关系...")
@@ -203,15 +199,13 @@ class IngestionService:
                     if n["type"] in ["Vision", "Self"]:
                         score = 1.0
                     
+                    # 列顺序同 _UPSERT_NODE_SQL；原地更新，保留 created_at 与 concept_vector
                     db_nodes.append((
-                        n["id"], n["user_id"], n["type"], n["name"], 
-                        n["content"], json.dumps(n["attributes"]), score
+                        n["id"], n["user_id"], n["type"], n["name"],
+                        n["content"], _dumps(n["attributes"]), "confirmed", None, None, None, score, None
                     ))
 
-                conn.executemany("""
-                    INSERT OR REPLACE INTO nodes (id, user_id, type, name, content, attributes, alignment_score)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, db_nodes)
+                conn.executemany(_UPSERT_NODE_SQL, db_nodes)
             
                 db_edges = [(e["source"], e["target"], e["relation"], e["user_id"]) for e in all_edges]
                 conn.executemany("""
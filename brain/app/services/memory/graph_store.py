@@ -5,36 +5,523 @@ SQLite 图谱存储实现 (Final Stable Version - Multi-User Support)
 import sqlite3
 import json
 import logging
+import os
+import queue
 import threading
+import time
 import hashlib
+import atexit
+import copy
+from array import array
+from functools import lru_cache
+from contextlib import contextmanager
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
-logging.basicConfig(level=logging.INFO)
+try:
+    import orjson
+except ImportError:  # orjson 未安装时回退到标准库 json
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# nodes.type_rank 为 GENERATED ALWAYS ... VIRTUAL 生成列，SQLite 3.31 以下无法建表 / 迁移，导入时直接报错
+MIN_SQLITE_VERSION = (3, 31, 0)
+if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+    raise RuntimeError(
+        f"GraphStore 需要 SQLite >= {'.'.join(map(str, MIN_SQLITE_VERSION))} (生成列 type_rank)，"
+        f"当前 Python 链接的是 {sqlite3.sqlite_version}"
+    )
+
+
+def _dumps(obj: Any) -> str:
+    """序列化为 JSON 文本（UTF-8 原样保留，等价于 ensure_ascii=False）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, ensure_ascii=False)
+
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+# 空属性的序列化结果，常见的无属性边 / 节点直接复用，跳过编码
+_EMPTY_JSON = "{}"
+
+
+def _load_attrs(text: Optional[str]) -> Dict[str, Any]:
+    """解析 attributes JSON；空值与最常见的 '{}' (三元组/概念节点) 直接返回新字典，不进解析器"""
+    if not text or text == "{}":
+        return {}
+    return _loads(text)
+
+# 记录在 PRAGMA user_version 中的存储版本
+# 1: 稳定 ID 由 md5 切换为 blake2b(digest_size=8)
+# 2: nodes 表增量列迁移收拢到 _migrate_schema，版本达标后不再逐次检查 table_info
+# 3: 旧版写入的带空格 JSON (attributes / properties) 统一压缩为紧凑格式
+# 4: nodes 表新增生成列 type_rank (战略视图层级排序)
+SCHEMA_VERSION = 4
+
+# 每条连接建立时执行一次的 PRAGMA
+# 注意：不开启 foreign_keys，edges 允许指向尚未落库的幽灵节点
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+    # ANALYZE 每个索引最多抽样约 1000 行，大库上也不会长时间占用写锁
+    "PRAGMA analysis_limit=1000",
+)
+
+# 单条语句中 IN (...) 绑定参数的上限：SQLite 3.32 之前 SQLITE_MAX_VARIABLE_NUMBER 默认为 999
+SQL_IN_CHUNK = 900
+
+# 前端 3D 图谱的节点分组 (Group) 映射，未列出的类型归入 7
+_GROUP_MAP = {
+    'Self': 1,
+    'Vision': 2, 'Goal': 2,
+    'Person': 3,
+    'Organization': 4,
+    'Project': 5, 'Task': 5,
+    'Insight': 6,
+}
+_GROUP_CASE = "CASE type " + " ".join(f"WHEN '{t}' THEN {g}" for t, g in _GROUP_MAP.items()) + " ELSE 7 END"
+# 战略视图的层级排序：Self -> Vision -> Goal -> Project -> Task -> Insight -> 其他
+_TYPE_RANK_CASE = "CASE type WHEN 'Self' THEN 0 WHEN 'Vision' THEN 1 WHEN 'Goal' THEN 2 WHEN 'Project' THEN 3 WHEN 'Task' THEN 4 WHEN 'Insight' THEN 5 ELSE 6 END"
+
+# --- 图谱可视化查询：view_type -> (节点 SQL, 节点表, 边表)，模块加载时拼好一次，语句缓存按相同文本命中 ---
+_GRAPH_COLUMNS = "id, type, name, content, attributes, strategic_role, energy_impact, alignment_score, group_id"
+_GRAPH_NODE_QUERIES = {
+    # 战略模式：只显示执行层级 (Vision -> Action) + Self 节点
+    'strategic': (
+        f"SELECT {_GRAPH_COLUMNS} FROM node_view WHERE user_id=? AND type IN ('Vision', 'Goal', 'Project', 'Task', 'Action', 'Self', 'Insight') "
+        "ORDER BY type_rank, created_at DESC LIMIT 1000",
+        "nodes", "edges",
+    ),
+    # 社交觉醒模式：只显示人与组织 + Self 节点
+    'people': (
+        f"SELECT {_GRAPH_COLUMNS} FROM node_view WHERE user_id=? AND type IN ('Person', 'Organization', 'Self') "
+        "ORDER BY CASE type WHEN 'Self' THEN 0 ELSE 1 END, energy_impact DESC, created_at DESC LIMIT 1000",
+        "nodes", "edges",
+    ),
+    # 暂存模式 (Memory Airlock): 从暂存表读取数据
+    'staging': (
+        f"SELECT {_GRAPH_COLUMNS} FROM staging_node_view WHERE user_id=? ORDER BY created_at DESC LIMIT 1000",
+        "staging_nodes", "staging_edges",
+    ),
+    # 全局模式：全量数据，优先高权重 (提升上限)
+    'global': (
+        f"SELECT {_GRAPH_COLUMNS} FROM node_view WHERE user_id=? ORDER BY energy_impact DESC, created_at DESC LIMIT 2000",
+        "nodes", "edges",
+    ),
+}
+_GRAPH_NODE_QUERIES['social'] = _GRAPH_NODE_QUERIES['people']
+
+# 关联边：source 与 target 两个方向分别走 (user_id, source/target) 索引再 UNION，
+# `source IN (...) OR target IN (...)` 的写法只能按 user_id 扫描该用户的全部边
+_GRAPH_EDGE_QUERY = """
+    SELECT source, target, relation FROM (
+        SELECT source, target, relation, created_at FROM {edge_table} WHERE user_id=? AND source IN ({ids})
+        UNION
+        SELECT source, target, relation, created_at FROM {edge_table} WHERE user_id=? AND target IN ({ids})
+        ORDER BY created_at DESC
+        LIMIT 5000
+    )
+"""
+
+# CTE 的 MATERIALIZED 提示需要 SQLite 3.35+；更早的版本不认识该关键字，省略后结果相同，只是不保证节点查询只算一次
+_CTE_MATERIALIZED = "MATERIALIZED " if sqlite3.sqlite_version_info >= (3, 35, 0) else ""
+
+# 节点查询与关联边查询合并为一条 UNION ALL 语句，kind 列区分 'N' / 'E'
+_GRAPH_FUSED_QUERIES = {
+    view_type: f"""
+        WITH n AS {_CTE_MATERIALIZED}({node_query})
+        SELECT 'N', n.*, NULL, NULL, NULL FROM n
+        UNION ALL
+        SELECT 'E', NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, source, target, relation FROM (
+            {_GRAPH_EDGE_QUERY.format(edge_table=edge_table, ids="SELECT id FROM n")}
+        )
+    """
+    for view_type, (node_query, _, edge_table) in _GRAPH_NODE_QUERIES.items()
+}
+
+
+def _graph_node(row: tuple, _load_attrs=_load_attrs, _str=str, _list=list) -> Dict[str, Any]:
+    """把一行 _GRAPH_COLUMNS 结果转换为前端节点 dict (含显示用的 data 字段)
+
+    逐行调用的热点函数：字段一次性解包为局部变量，解析器等全局名通过默认参数绑定为局部名。
+    """
+    nid, ntype, name, content, attributes, strategic_role, energy_impact, alignment_score, group = row
+    # 准备前端显示数据
+    display_data = {
+        "类型": ntype,
+        "描述": content or "无详细内容"
+    }
+    
+    # Phase 2: 显示战略属性
+    if strategic_role:
+        display_data["战略角色"] = strategic_role
+    if energy_impact:
+        display_data["能量影响"] = _str(energy_impact)
+    
+    # 如果有档案信息，也加入显示
+    attrs = _load_attrs(attributes)
+    dossier = attrs.get('dossier')
+    if dossier:
+        for k, v in dossier.items():
+            display_data[f"档案_{k}"] = ", ".join(v) if isinstance(v, _list) else _str(v)
+
+    return {
+        "id": nid,
+        "label": name or (content[:20] if content else "Unknown"),
+        "group": group,
+        "type": ntype,
+        "content": content,
+        "attributes": attrs,
+        "data": display_data,
+        "alignment_score": alignment_score
+    }
+
+
+def _graph_node_brief(row: tuple) -> Dict[str, Any]:
+    """_graph_node 的精简版：不解析 attributes、不构造 data，供只需要标签与分组的调用方使用"""
+    nid, ntype, name, content, _, _, _, alignment_score, group = row
+    return {
+        "id": nid,
+        "label": name or (content[:20] if content else "Unknown"),
+        "group": group,
+        "type": ntype,
+        "content": content,
+        "alignment_score": alignment_score
+    }
+
+
+def _ghost_node(nid: str, row: Optional[tuple], _group=_GROUP_MAP.get) -> Dict[str, Any]:
+    """边另一端的邻居节点：查到详情时给出精简 dict，查不到则作为 Ghost 占位"""
+    if row is None:
+        return {"id": nid, "label": nid, "group": 7, "type": "Concept (Linked)"}
+    nid, ntype, name, content, alignment_score = row
+    # 使用相同的 Group 映射逻辑
+    return {
+        "id": nid,
+        "label": name or "Unknown",
+        "group": _group(ntype, 7),
+        "type": ntype,
+        "content": content,
+        "alignment_score": alignment_score
+    }
+
+
+def _fetch_ghost_nodes(conn, view_type: str, e_rows: List[tuple], node_ids: set) -> List[Dict[str, Any]]:
+    """边另一端不在当前结果中的节点 (按边顺序、先 target 后 source 去重)，按 SQL_IN_CHUNK 分批 IN 查询取回详情
+
+    get_all_graph_data 与 get_graph_columns 共用，保证两者的 Ghost 节点及其顺序一致
+    """
+    missing = [
+        nid for nid in dict.fromkeys(nid for source, target, _ in e_rows for nid in (target, source))
+        if nid not in node_ids
+    ]
+    if not missing:
+        return []
+    _, node_table, _ = _GRAPH_NODE_QUERIES[view_type]
+    score = '0 as alignment_score' if view_type == 'staging' else 'alignment_score'
+    ghost_rows = {}
+    # 边上限 5000 条，缺失端点可达上万个；分批绑定，不超过旧版 SQLite 的参数上限
+    for i in range(0, len(missing), SQL_IN_CHUNK):
+        chunk = missing[i:i + SQL_IN_CHUNK]
+        ghost_query = f"SELECT id, type, name, content, {score} FROM {node_table} WHERE id IN ({','.join('?' * len(chunk))})"
+        ghost_rows.update((row[0], row) for row in conn.execute(ghost_query, chunk))
+    # 补全缺失的节点 (Ghost Nodes)：优先使用批量取回的节点详情，而不是直接作为 Ghost
+    return [_ghost_node(nid, ghost_rows.get(nid)) for nid in missing]
+
+
+def _staging_node(row: tuple, _group=_GROUP_MAP.get) -> Dict[str, Any]:
+    """暂存区节点行 (id, type, name, content, attributes) 转换为前端节点 dict"""
+    nid, ntype, name, content, attributes = row
+    return {
+        "id": nid,
+        "label": name or (content[:20] if content else "Unknown"),
+        "group": _group(ntype, 7),
+        "type": ntype,
+        "content": content,
+        "attributes": _load_attrs(attributes)
+    }
+
+# WAL 检查点：关闭自动检查点，改由后台线程在独立连接上定期执行 PASSIVE 检查点，累计写事务过多时提前唤醒；
+# WAL 文件超过阈值时才尝试截断
+WAL_CHECKPOINT_INTERVAL = 30  # 秒
+WAL_CHECKPOINT_WRITES = 10000
+WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+
+# 统计信息维护：每小时一次；期间写事务超过阈值时完整 ANALYZE，否则只做开销很小的 PRAGMA optimize
+ANALYZE_INTERVAL = 3600  # 秒
+ANALYZE_WRITES = 10000
+
+# add_log 写队列：请求线程只入队，后台线程攒批后一次事务写入
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 200
+
+# 图谱 / 统计读结果的短 TTL 缓存，吸收前端可视化的高频轮询；任一写事务提交即失效
+READ_CACHE_TTL = 2.0  # 秒
+READ_CACHE_SIZE = 256
+
+# sqlite3 按 SQL 文本缓存预编译语句 (默认 128 条)；热点语句统一用下方常量，保证命中缓存
+STATEMENT_CACHE_SIZE = 512
+
+# 冲突时原地更新而非 REPLACE (先删后插)：保留 created_at 与 concept_vector，也少写一遍页
+_UPSERT_NODE_SQL = """
+    INSERT INTO nodes (id, user_id, type, name, content, attributes, status, time_metadata, strategic_role, energy_impact, alignment_score, source_file)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        user_id = excluded.user_id, type = excluded.type, name = excluded.name, content = excluded.content,
+        attributes = excluded.attributes, status = excluded.status, time_metadata = excluded.time_metadata,
+        strategic_role = excluded.strategic_role, energy_impact = excluded.energy_impact,
+        alignment_score = excluded.alignment_score, source_file = excluded.source_file
+"""
+_INSERT_EDGE_SQL = "INSERT OR IGNORE INTO edges (source, target, relation, user_id, properties) VALUES (?, ?, ?, ?, ?)"
+
+
+# --- upsert_entities_batch 的 SQL 侧档案 (dossier) 合并 ---
+# 旧 attributes 非法或不是 JSON 对象时按 {} 处理
+_OLD_ATTRS = "coalesce(CASE WHEN json_valid(nodes.attributes) THEN CASE json_type(nodes.attributes) WHEN 'object' THEN nodes.attributes END END, '{}')"
+_OLD_DOSSIER = f"coalesce(CASE json_type({_OLD_ATTRS}, '$.dossier') WHEN 'object' THEN json_extract({_OLD_ATTRS}, '$.dossier') END, '{{}}')"
+_NEW_DOSSIER = "json_extract(excluded.attributes, '$.dossier')"
+# 新档案逐键覆盖旧档案；两边都是列表时取去重并集，与原先 Python 侧 list(set(a + b)) 的语义一致
+# json_each 的 value 经过子查询会丢失 JSON 子类型，最外层按 type 还原
+_MERGED_DOSSIER = f"""(
+    SELECT json_group_object(key, CASE type
+        WHEN 'object' THEN json(value) WHEN 'array' THEN json(value)
+        WHEN 'true' THEN json('true') WHEN 'false' THEN json('false') WHEN 'null' THEN json('null')
+        ELSE value END)
+    FROM (
+        SELECT o.key, o.type, o.value FROM json_each({_OLD_DOSSIER}) o
+        WHERE o.key NOT IN (SELECT key FROM json_each({_NEW_DOSSIER}))
+        UNION ALL
+        SELECT n.key, n.type, CASE WHEN n.type = 'array' AND o.type = 'array'
+            THEN (SELECT json_group_array(value) FROM (SELECT value FROM json_each(o.value) UNION SELECT value FROM json_each(n.value)))
+            ELSE n.value END
+        FROM json_each({_NEW_DOSSIER}) n LEFT JOIN json_each({_OLD_DOSSIER}) o ON o.key = n.key
+    )
+)"""
+_UPSERT_ENTITIES_SQL = f"""
+    INSERT INTO nodes (id, user_id, type, name, content, attributes, status, energy_impact, alignment_score)
+    SELECT id, user_id, type, name, content, json_object('dossier', json(dossier)), status, energy_impact, alignment_score
+    FROM _entity_batch WHERE true ORDER BY seq
+    ON CONFLICT(id) DO UPDATE SET
+        type = excluded.type,
+        content = CASE WHEN excluded.content != '' THEN excluded.content ELSE nodes.content END,
+        attributes = json_set({_OLD_ATTRS}, '$.dossier', json({_MERGED_DOSSIER})),
+        status = excluded.status,
+        energy_impact = excluded.energy_impact,
+        alignment_score = excluded.alignment_score
+"""
+
+
+def _legacy_stable_id(text: str) -> str:
+    """旧版 (user_version < 1) 的 md5 稳定 ID，仅供一次性迁移使用"""
+    return f"con_{hashlib.md5(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+@lru_cache(maxsize=65536)
+def _stable_id_digest(text: str) -> str:
+    """名称 -> 16 位十六进制摘要；批量写入中同名实体大量重复，缓存后只哈希一次"""
+    # blake2b 的 8 字节摘要正好是 16 位十六进制，无需再截断
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _pack_vector(vector) -> Optional[bytes]:
+    """将概念向量压缩为 float32 原始字节，供 concept_vector BLOB 列存储"""
+    if not vector:
+        return None
+    return array('f', vector).tobytes()
+
+
 class GraphStore:
     def __init__(self, db_path: str = "./data/brain.db"):
         self.db_path = db_path
-        self._lock = threading.Lock()
+        # 写锁：所有写操作共用同一条写连接；可重入，兼容外部 `with _lock, _get_conn()` 的写法
+        self._lock = threading.RLock()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._writer = self._connect()
+        # WAL 是持久化设置，且不能在事务内切换，建连后设置一次即可
+        self._writer.execute("PRAGMA journal_mode=WAL;")
+        # 自动检查点会在某次写请求的提交中途触发并阻塞它，改为显式管理
+        self._writer.execute("PRAGMA wal_autocheckpoint=0;")
+        # 已提交写事务总数 (写锁内递增) 与上次完整检查点时的计数 (仅维护线程更新)，二者之差即待回写的写事务数
+        self._write_count = 0
+        self._ckpt_write_count = 0
+        self._writes_since_analyze = 0
+        # 检查点专用连接，只在维护线程中使用；busy_timeout=0：截断遇到活跃读者时立即放弃，不等待
+        self._ckpt_conn = self._connect()
+        self._ckpt_conn.execute("PRAGMA busy_timeout=0")
+        # 写事务累计过多时唤醒维护线程提前做检查点
+        self._ckpt_wanted = threading.Event()
+        # 读缓存：key -> (数据版本, 时间戳, 结果对象)
+        self._read_cache: Dict[tuple, tuple] = {}
+        # close() 置位后后台线程退出
+        self._closed = threading.Event()
+        self._maintenance_thread = threading.Thread(target=self._maintenance_loop, name="graph-maintenance", daemon=True)
+        self._maintenance_thread.start()
+        # 只读连接池：WAL 模式下读者与写者互不阻塞
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=os.cpu_count() or 4)
+        self._tables_ready = False
         self._init_db()
+        # 专供 PRAGMA data_version 的只读连接：任何其他连接 (本实例的写连接、其他实例或进程) 提交后其值都会变化
+        self._version_conn = self._connect(readonly=True)
+        self._version_lock = threading.Lock()
+        # 日志写队列：由单个后台线程消费，首条日志入队时才启动，进程退出前清空
+        self._log_q: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._log_thread: Optional[threading.Thread] = None
+        self._log_thread_lock = threading.Lock()
+        # 上次 flush() 以来未能落库的日志条数
+        self._log_failures = 0
+        # 维护线程与写连接在构造时即已存在，无论是否写过日志，进程退出前都要收尾
+        atexit.register(self.close)
 
     def _get_stable_id(self, text: str) -> str:
         """生成稳定的 ID，防止 Python hash() 随机化问题"""
-        return f"con_{hashlib.md5(text.encode('utf-8')).hexdigest()[:16]}"
+        return f"con_{_stable_id_digest(text)}"
 
-    def _get_conn(self):
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        if readonly:
+            uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            # isolation_level=None：由 _writer_conn 显式管理 BEGIN IMMEDIATE / COMMIT
+            conn = sqlite3.connect(
+                self.db_path, check_same_thread=False, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE
+            )
         conn.row_factory = sqlite3.Row
+        # 连接级性能参数，只在建连时设置一次 (journal_mode=WAL 是持久化的，由 __init__ 设置)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         return conn
 
+    @contextmanager
+    def _writer_conn(self):
+        """独占写连接：持有写锁并以 BEGIN IMMEDIATE 开启事务，正常退出时提交，异常时回滚"""
+        with self._lock:
+            conn = self._writer
+            if conn.in_transaction:
+                # 嵌套调用 (如 _ensure_tables -> _init_db) 直接并入外层事务
+                yield conn
+                return
+            # 一开始就拿到写锁，整段操作只提交一次，也避免中途锁升级导致的 SQLITE_BUSY
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+            self._write_count += 1
+            self._writes_since_analyze += 1
+            if self._write_count - self._ckpt_write_count >= WAL_CHECKPOINT_WRITES:
+                self._ckpt_wanted.set()
+
+    def _checkpoint(self):
+        """
+        WAL 检查点，仅由维护线程调用。
+        PASSIVE 检查点在独立连接上执行且不持写锁：不等待读者，也不阻塞写入。
+        全部帧已回写且 WAL 文件超过 WAL_TRUNCATE_BYTES 时，再在写锁内尝试一次 TRUNCATE 收回磁盘空间。
+        """
+        try:
+            writes = self._write_count
+            _, log_frames, done_frames = self._ckpt_conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            if log_frames != done_frames:
+                # 仍有读者占用旧快照，剩余帧留到下一轮
+                return
+            self._ckpt_write_count = writes
+            wal_path = f"{self.db_path}-wal"
+            if os.path.exists(wal_path) and os.path.getsize(wal_path) > WAL_TRUNCATE_BYTES:
+                with self._lock:
+                    self._ckpt_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except Exception as e:
+            logger.warning("WAL checkpoint failed: %s", e)
+
+    def _refresh_stats(self):
+        """刷新查询规划器统计信息，须在写锁内调用 (只读连接池无法写 sqlite_stat1)"""
+        try:
+            if self._writes_since_analyze > ANALYZE_WRITES:
+                self._writer.execute("ANALYZE")
+            else:
+                self._writer.execute("PRAGMA optimize")
+            self._writes_since_analyze = 0
+        except Exception as e:
+            logger.warning("Refresh planner stats failed: %s", e)
+
+    def _maintenance_loop(self):
+        """后台线程：定期执行检查点，让 WAL 文件保持有界；每小时在写锁内刷新一次统计信息"""
+        last_analyze = time.monotonic()
+        while True:
+            self._ckpt_wanted.wait(WAL_CHECKPOINT_INTERVAL)
+            if self._closed.is_set():
+                break
+            self._ckpt_wanted.clear()
+            if self._write_count != self._ckpt_write_count:
+                self._checkpoint()
+            if time.monotonic() - last_analyze >= ANALYZE_INTERVAL:
+                with self._lock:
+                    self._refresh_stats()
+                last_analyze = time.monotonic()
+
+    @contextmanager
+    def _reader_conn(self, row: bool = True):
+        """从只读连接池借出一条连接，用完归还；池空时临时新建
+
+        row=False 时查询直接返回元组，省去 sqlite3.Row 的逐列封装，适合大结果集
+        """
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._connect(readonly=True)
+        if not row:
+            conn.row_factory = None
+        try:
+            yield conn
+        finally:
+            conn.row_factory = sqlite3.Row
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _data_version(self) -> int:
+        """数据库的数据版本：同一连接上两次读取之间若有任何连接提交过写事务，值就不同"""
+        with self._version_lock:
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _cached_read(self, key: tuple, loader, mutable: bool = False):
+        """短 TTL 读缓存：未过期且期间没有任何写事务提交 (含其他实例与进程) 时直接返回上次结果
+
+        缓存中存放结果对象本身，命中与未命中返回的都是同一份共享对象，调用方须视为只读；
+        需要修改返回值时传 mutable=True，另行深拷贝一份。
+        数据版本在执行查询前取得，查询期间若有提交，存入的结果会立即失效；出错的结果不缓存
+        """
+        now = time.monotonic()
+        version = self._data_version()
+        hit = self._read_cache.get(key)
+        if hit is not None and hit[0] == version and now - hit[1] < READ_CACHE_TTL:
+            result = hit[2]
+        else:
+            result = loader()
+            if result and "error" not in result:
+                if len(self._read_cache) >= READ_CACHE_SIZE:
+                    self._read_cache.clear()
+                self._read_cache[key] = (version, now, result)
+        return copy.deepcopy(result) if mutable else result
+
+    def _get_conn(self, write: bool = True):
+        """兼容 API 层直接访问数据库的入口
+
+        默认走写连接 (持写锁 + BEGIN IMMEDIATE)；纯查询请传 write=False，借用只读连接池，不与写者互斥
+        """
+        return self._writer_conn() if write else self._reader_conn()
+
     def _init_db(self):
         try:
-            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-            with self._lock, self._get_conn() as conn:
-                conn.execute("PRAGMA journal_mode=WAL;")
+            with self._writer_conn() as conn:
                 # 节点表 - 增加 user_id
-                conn.execute("""
+                conn.execute(f"""
                     CREATE TABLE IF NOT EXISTS nodes (
                         id TEXT PRIMARY KEY,
                         user_id TEXT NOT NULL,
@@ -48,46 +535,21 @@ class GraphStore:
                         energy_impact INTEGER, -- Phase 2: 能量影响
                         alignment_score REAL DEFAULT 0.0, -- Phase 3: 与 Vision 的对齐分 (0-1)
                         source_file TEXT, -- 来源档案
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        concept_vector BLOB, -- 概念向量 (float32 原始字节)，不再塞进 attributes JSON
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        type_rank INTEGER GENERATED ALWAYS AS ({_TYPE_RANK_CASE}) VIRTUAL -- 战略视图层级排序
                     );
                 """)
                 
-                # [Strategic Brain] 自动迁移：检查并添加 status, time_metadata, strategic_role, energy_impact, alignment_score, source_file 列
-                try:
-                    # 检查列是否存在
-                    cursor = conn.execute("PRAGMA table_info(nodes)")
-                    columns = [row['name'] for row in cursor.fetchall()]
-                    
-                    if 'status' not in columns:
-                        logger.info("Migrating database: Adding 'status' column to nodes table...")
-                        conn.execute("ALTER TABLE nodes ADD COLUMN status TEXT DEFAULT 'confirmed'")
-                        
-                    if 'time_metadata' not in columns:
-                        logger.info("Migrating database: Adding 'time_metadata' column to nodes table...")
-                        conn.execute("ALTER TABLE nodes ADD COLUMN time_metadata JSON")
-
-                    if 'strategic_role' not in columns:
-                        logger.info("Migrating database: Adding 'strategic_role' column to nodes table...")
-                        conn.execute("ALTER TABLE nodes ADD COLUMN strategic_role TEXT")
-
-                    if 'energy_impact' not in columns:
-                        logger.info("Migrating database: Adding 'energy_impact' column to nodes table...")
-                        conn.execute("ALTER TABLE nodes ADD COLUMN energy_impact INTEGER")
-
-                    if 'alignment_score' not in columns:
-                        logger.info("Migrating database: Adding 'alignment_score' column to nodes table...")
-                        conn.execute("ALTER TABLE nodes ADD COLUMN alignment_score REAL DEFAULT 0.0")
-
-                    if 'source_file' not in columns:
-                        logger.info("Migrating database: Adding 'source_file' column to nodes table...")
-                        conn.execute("ALTER TABLE nodes ADD COLUMN source_file TEXT")
-                        
-                except Exception as e:
-                    logger.warning(f"Database migration check warning: {e}")
-
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_user ON nodes(user_id);")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(type);")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_status ON nodes(status);")
+                # 复合索引对齐实际的 WHERE 条件；单列 user_id 索引是其前缀，已冗余
+                # 末列 created_at 与可视化查询的 ORDER BY 对齐；旧的 (user_id, type) 索引是其前缀，已冗余
+                conn.execute("DROP INDEX IF EXISTS idx_nodes_user;")
+                conn.execute("DROP INDEX IF EXISTS idx_nodes_user_type;")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_user_type_created ON nodes(user_id, type, created_at DESC);")
+                # 所有按 type 过滤的查询都同时带 user_id，由上面的复合索引覆盖；单列 type 索引只增加写入开销
+                conn.execute("DROP INDEX IF EXISTS idx_nodes_type;")
+                # 部分索引只收录 ID 不规范的 Vision 节点，_heal_vision_nodes 无需全表扫描 (条件须与其查询逐字一致)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_bad_vision ON nodes(user_id) WHERE type = 'Vision' AND substr(id, 1, 7) <> 'vision_';")
                 # 边表 - 增加 user_id 并修改主键
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS edges (
@@ -102,7 +564,11 @@ class GraphStore:
                         FOREIGN KEY(target) REFERENCES nodes(id)
                     );
                 """)
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_edges_user ON edges(user_id);")
+                conn.execute("DROP INDEX IF EXISTS idx_edges_user;")
+                conn.execute("DROP INDEX IF EXISTS idx_edges_user_source;")
+                conn.execute("DROP INDEX IF EXISTS idx_edges_user_target;")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_edges_user_source_created ON edges(user_id, source, created_at DESC);")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_edges_user_target_created ON edges(user_id, target, created_at DESC);")
                 conn.execute("CREATE INDEX IF NOT EXISTS idx_edges_source ON edges(source);")
                 conn.execute("CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target);")
 
@@ -144,87 +610,216 @@ class GraphStore:
                         PRIMARY KEY (source, target, relation, user_id)
                     );
                 """)
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_staging_nodes_user ON staging_nodes(user_id);")
+                conn.execute("DROP INDEX IF EXISTS idx_staging_nodes_user;")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_staging_nodes_user_type ON staging_nodes(user_id, type);")
+                # 暂存视图按 created_at DESC 取最新 1000 条
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_staging_nodes_user_created ON staging_nodes(user_id, created_at DESC);")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_staging_nodes_bad_vision ON staging_nodes(user_id) WHERE type = 'Vision' AND substr(id, 1, 7) <> 'vision_';")
                 conn.execute("CREATE INDEX IF NOT EXISTS idx_staging_edges_user ON staging_edges(user_id);")
+
+                # 稳定 ID 迁移的 旧ID -> 新ID 映射，等待向量库同步改名 (见 get_pending_id_renames)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS stable_id_renames (
+                        old_id TEXT PRIMARY KEY,
+                        new_id TEXT NOT NULL
+                    );
+                """)
+
+                # 按 user_version 执行一次性的结构与数据迁移，已是最新版本时整段跳过
+                self._migrate_schema(conn)
+                # status / type_rank 列可能由迁移补齐，其索引放在迁移之后创建
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_status ON nodes(status);")
+                # 战略视图按 (type_rank, created_at DESC) 直接沿索引顺序读取，无需逐行计算 CASE 再排序
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_user_rank_created ON nodes(user_id, type_rank, created_at DESC);")
+                # 全局视图 ORDER BY energy_impact DESC, created_at DESC LIMIT 2000：沿索引读到 LIMIT 即停，不再整用户排序
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_user_energy_created ON nodes(user_id, energy_impact DESC, created_at DESC);")
+
+                # 可视化读取用的视图：分组与层级排序在 SQL 中算好，不再逐行在 Python 中映射
+                # 每次启动按当前代码重建，定义变更无需迁移
+                conn.execute("DROP VIEW IF EXISTS node_view;")
+                conn.execute(f"""
+                    CREATE VIEW node_view AS
+                    SELECT id, user_id, type, name, content, attributes, strategic_role, energy_impact, alignment_score,
+                           {_GROUP_CASE} AS group_id, type_rank, created_at
+                    FROM nodes
+                """)
+                conn.execute("DROP VIEW IF EXISTS staging_node_view;")
+                conn.execute(f"""
+                    CREATE VIEW staging_node_view AS
+                    SELECT id, user_id, type, name, content, attributes, NULL AS strategic_role, NULL AS energy_impact, 0 AS alignment_score,
+                           {_GROUP_CASE} AS group_id, {_TYPE_RANK_CASE} AS type_rank, created_at
+                    FROM staging_nodes
+                """)
                 
                 # [Strategic Brain] 自动修复：合并存量重复的 Vision 节点
                 self._heal_vision_nodes(conn)
+
+                # 首次建立统计信息用 ANALYZE，之后交给开销很小的 PRAGMA optimize 按需刷新
+                has_stats = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+                conn.execute("PRAGMA optimize" if has_stats else "ANALYZE")
                 
-            logger.info(f"SQLite GraphStore 初始化成功: {self.db_path}")
+            self._tables_ready = True
+            logger.info("SQLite GraphStore 初始化成功: %s", self.db_path)
         except Exception as e:
-            logger.error(f"SQLite 初始化失败: {e}")
+            logger.exception("SQLite 初始化失败: %s", e)
             raise
 
+    def _migrate_schema(self, conn):
+        """按 PRAGMA user_version 执行一次性迁移，成功后写入最新版本号"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        if version < 1:
+            self._migrate_stable_ids(conn)
+        if version < 2:
+            self._migrate_node_columns(conn)
+        if version < 3:
+            self._migrate_compact_json(conn)
+        if version < 4:
+            self._migrate_type_rank(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _migrate_node_columns(self, conn):
+        """[Strategic Brain] 自动迁移：为旧库的 nodes 表补齐后续版本新增的列"""
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(nodes)").fetchall()}
+        columns_to_add = {
+            "status": "TEXT DEFAULT 'confirmed'",
+            "time_metadata": "JSON",
+            "strategic_role": "TEXT",
+            "energy_impact": "INTEGER",
+            "alignment_score": "REAL DEFAULT 0.0",
+            "source_file": "TEXT",
+            "concept_vector": "BLOB",
+        }
+        for col, type_def in columns_to_add.items():
+            if col not in columns:
+                logger.info("Migrating database: Adding '%s' column to nodes table...", col)
+                conn.execute(f"ALTER TABLE nodes ADD COLUMN {col} {type_def}")
+        if "concept_vector" not in columns:
+            self._migrate_concept_vectors(conn)
+
+    def _migrate_compact_json(self, conn):
+        """一次性迁移：用 SQLite json() 重写旧的 JSON 文本，去掉 json.dumps 默认分隔符带来的空格"""
+        for table, column in (("nodes", "attributes"), ("staging_nodes", "attributes"),
+                              ("edges", "properties"), ("staging_edges", "properties")):
+            cur = conn.execute(
+                f"UPDATE {table} SET {column} = json({column}) WHERE json_valid({column}) AND {column} != json({column})"
+            )
+            if cur.rowcount > 0:
+                logger.info("Compacted %s JSON values in %s.%s", cur.rowcount, table, column)
+
+    def _migrate_type_rank(self, conn):
+        """为旧库的 nodes 表补上 type_rank 生成列 (ALTER TABLE 只能添加 VIRTUAL 生成列，值由索引持久化)"""
+        # 生成列不出现在 table_info 中，需用 table_xinfo 检查
+        columns = {row['name'] for row in conn.execute("PRAGMA table_xinfo(nodes)").fetchall()}
+        if "type_rank" not in columns:
+            logger.info("Migrating database: Adding generated 'type_rank' column to nodes table...")
+            conn.execute(f"ALTER TABLE nodes ADD COLUMN type_rank INTEGER GENERATED ALWAYS AS ({_TYPE_RANK_CASE}) VIRTUAL")
+
+    def _migrate_stable_ids(self, conn):
+        """一次性迁移：把 md5 生成的 con_ 稳定 ID 重写为 blake2b 版本，并同步更新边；向量库的改名见 get_pending_id_renames"""
+        id_map = {}
+        for table in ("nodes", "staging_nodes"):
+            rows = conn.execute(f"SELECT id, name FROM {table} WHERE id LIKE 'con_%' AND name IS NOT NULL").fetchall()
+            for row in rows:
+                # 只迁移确实由名称派生的 ID，其余 con_ 前缀 ID 保持原样
+                if row['id'] == _legacy_stable_id(row['name']):
+                    id_map[row['id']] = self._get_stable_id(row['name'])
+        if not id_map:
+            return
+
+        logger.info("Migrating %s stable ids from md5 to blake2b...", len(id_map))
+        # 映射落在持久表中而非临时表：Chroma 里以旧 ID 为键的向量由 MemoryService 启动时按此表改名，完成后再清除
+        conn.executemany("INSERT OR REPLACE INTO stable_id_renames (old_id, new_id) VALUES (?, ?)", id_map.items())
+        for node_table, edge_table in (("nodes", "edges"), ("staging_nodes", "staging_edges")):
+            # OR IGNORE + 随后的 DELETE：目标 ID 已存在时视为重复，直接丢弃旧行
+            conn.execute(f"""
+                UPDATE OR IGNORE {node_table} SET id = (SELECT new_id FROM stable_id_renames WHERE old_id = {node_table}.id)
+                WHERE id IN (SELECT old_id FROM stable_id_renames)
+            """)
+            conn.execute(f"DELETE FROM {node_table} WHERE id IN (SELECT old_id FROM stable_id_renames)")
+            for col in ("source", "target"):
+                conn.execute(f"""
+                    UPDATE OR IGNORE {edge_table} SET {col} = (SELECT new_id FROM stable_id_renames WHERE old_id = {edge_table}.{col})
+                    WHERE {col} IN (SELECT old_id FROM stable_id_renames)
+                """)
+                conn.execute(f"DELETE FROM {edge_table} WHERE {col} IN (SELECT old_id FROM stable_id_renames)")
+
+    def _migrate_concept_vectors(self, conn):
+        """一次性迁移：把旧版存放在 attributes.vector 中的概念向量搬到 concept_vector 列"""
+        rows = conn.execute(
+            "SELECT id, attributes FROM nodes WHERE type = 'Concept' AND attributes LIKE '%\"vector\"%'"
+        ).fetchall()
+        updates = []
+        for row in rows:
+            try:
+                attrs = _loads(row['attributes'])
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(attrs, dict) or 'vector' not in attrs:
+                continue
+            vector = attrs.pop('vector')
+            updates.append((_pack_vector(vector), _dumps(attrs), row['id']))
+        if updates:
+            logger.info("Migrating %s concept vectors out of attributes JSON...", len(updates))
+            conn.executemany("UPDATE nodes SET concept_vector = ?, attributes = ? WHERE id = ?", updates)
+
     def _heal_vision_nodes(self, conn):
         """[Strategic Brain] 自动修复：将所有类型为 Vision 的节点归一化到 vision_{user_id}"""
         try:
-            # 1. 查找所有 Vision 类型的节点，但 ID 不是标准格式的
-            rows = conn.execute("SELECT id, user_id FROM nodes WHERE type = 'Vision' AND id NOT LIKE 'vision_%'").fetchall()
-            for row in rows:
-                old_id = row['id']
-                user_id = row['user_id']
-                target_id = f"vision_{user_id}"
-                
-                logger.info(f"Healing Vision node: Merging {old_id} into {target_id}")
-                
-                # 更新边：使用 INSERT OR IGNORE 模拟合并，然后删除旧边
-                # 1. 处理源
-                conn.execute("""
-                    INSERT OR IGNORE INTO edges (source, target, relation, user_id, properties, created_at)
-                    SELECT ?, target, relation, user_id, properties, created_at FROM edges 
-                    WHERE source = ? AND user_id = ?
-                """, (target_id, old_id, user_id))
-                conn.execute("DELETE FROM edges WHERE source = ? AND user_id = ?", (old_id, user_id))
-                
-                # 2. 处理目标
-                conn.execute("""
-                    INSERT OR IGNORE INTO edges (source, target, relation, user_id, properties, created_at)
-                    SELECT source, ?, relation, user_id, properties, created_at FROM edges 
-                    WHERE target = ? AND user_id = ?
-                """, (target_id, old_id, user_id))
-                conn.execute("DELETE FROM edges WHERE target = ? AND user_id = ?", (old_id, user_id))
-                
-                # 更新节点：如果目标节点不存在，则将旧节点 ID 改为目标 ID
-                # 如果目标节点已存在，则删除旧节点（假设目标节点是由设置同步生成的，更权威）
-                exists = conn.execute("SELECT id FROM nodes WHERE id = ? AND user_id = ?", (target_id, user_id)).fetchone()
-                if not exists:
-                    conn.execute("UPDATE nodes SET id = ? WHERE id = ? AND user_id = ?", (target_id, old_id, user_id))
-                else:
-                    conn.execute("DELETE FROM nodes WHERE id = ? AND user_id = ?", (old_id, user_id))
-                    
-            # 2. 对暂存区执行同样的操作
-            s_rows = conn.execute("SELECT id, user_id FROM staging_nodes WHERE type = 'Vision' AND id NOT LIKE 'vision_%'").fetchall()
-            for row in s_rows:
-                old_id = row['id']
-                user_id = row['user_id']
-                target_id = f"vision_{user_id}"
-                
-                # 暂存区边处理
-                conn.execute("""
-                    INSERT OR IGNORE INTO staging_edges (source, target, relation, user_id, properties, created_at)
-                    SELECT ?, target, relation, user_id, properties, created_at FROM staging_edges 
-                    WHERE source = ? AND user_id = ?
-                """, (target_id, old_id, user_id))
-                conn.execute("DELETE FROM staging_edges WHERE source = ? AND user_id = ?", (old_id, user_id))
-                
-                conn.execute("""
-                    INSERT OR IGNORE INTO staging_edges (source, target, relation, user_id, properties, created_at)
-                    SELECT source, ?, relation, user_id, properties, created_at FROM staging_edges 
-                    WHERE target = ? AND user_id = ?
-                """, (target_id, old_id, user_id))
-                conn.execute("DELETE FROM staging_edges WHERE target = ? AND user_id = ?", (old_id, user_id))
-                
-                exists = conn.execute("SELECT id FROM staging_nodes WHERE id = ? AND user_id = ?", (target_id, user_id)).fetchone()
-                if not exists:
-                    conn.execute("UPDATE staging_nodes SET id = ? WHERE id = ? AND user_id = ?", (target_id, old_id, user_id))
-                else:
-                    conn.execute("DELETE FROM staging_nodes WHERE id = ? AND user_id = ?", (old_id, user_id))
-                    
+            # 正式图谱与暂存区执行同样的操作
+            for nodes_table, edges_table in (("nodes", "edges"), ("staging_nodes", "staging_edges")):
+                self._heal_vision_table(conn, nodes_table, edges_table)
         except Exception as e:
-            logger.error(f"Heal Vision nodes failed: {e}")
+            logger.exception("Heal Vision nodes failed: %s", e)
+
+    def _heal_vision_table(self, conn, nodes_table, edges_table):
+        """以集合方式合并单张表中 ID 不规范的 Vision 节点，语句数与待修复节点数无关"""
+        # 查找所有 Vision 类型的节点，但 ID 不是标准格式的；走 idx_*_bad_vision 部分索引，规范库上几乎零成本
+        bad = f"""
+            WITH bad AS (
+                SELECT id AS old_id, user_id, 'vision_' || user_id AS target_id
+                FROM {nodes_table} INDEXED BY idx_{nodes_table}_bad_vision
+                WHERE type = 'Vision' AND substr(id, 1, 7) <> 'vision_'
+            )
+        """
+        count = conn.execute(f"{bad} SELECT COUNT(*) FROM bad").fetchone()[0]
+        if not count:
+            return
+        logger.info("Healing %d Vision node(s) in %s", count, nodes_table)
+
+        # 更新边：使用 INSERT OR IGNORE 模拟合并，然后删除旧边
+        # 1. 处理源
+        conn.execute(f"""{bad}
+            INSERT OR IGNORE INTO {edges_table} (source, target, relation, user_id, properties, created_at)
+            SELECT bad.target_id, e.target, e.relation, e.user_id, e.properties, e.created_at
+            FROM {edges_table} e JOIN bad ON e.source = bad.old_id AND e.user_id = bad.user_id
+        """)
+        conn.execute(f"{bad} DELETE FROM {edges_table} WHERE (source, user_id) IN (SELECT old_id, user_id FROM bad)")
+        # 2. 处理目标
+        conn.execute(f"""{bad}
+            INSERT OR IGNORE INTO {edges_table} (source, target, relation, user_id, properties, created_at)
+            SELECT e.source, bad.target_id, e.relation, e.user_id, e.properties, e.created_at
+            FROM {edges_table} e JOIN bad ON e.target = bad.old_id AND e.user_id = bad.user_id
+        """)
+        conn.execute(f"{bad} DELETE FROM {edges_table} WHERE (target, user_id) IN (SELECT old_id, user_id FROM bad)")
+
+        # 更新节点：目标节点不存在时，将每个用户最早写入 (rowid 最小) 的旧节点改名为目标 ID，与逐行修复时的扫描顺序一致；
+        # 其余旧节点一律删除（目标节点由设置同步生成或刚刚改名而来，更权威）
+        conn.execute(f"""
+            UPDATE {nodes_table} SET id = 'vision_' || user_id
+            WHERE type = 'Vision' AND substr(id, 1, 7) <> 'vision_'
+              AND rowid = (
+                  SELECT MIN(b.rowid) FROM {nodes_table} b
+                  WHERE b.user_id = {nodes_table}.user_id AND b.type = 'Vision' AND substr(b.id, 1, 7) <> 'vision_'
+              )
+              AND NOT EXISTS (SELECT 1 FROM {nodes_table} t WHERE t.id = 'vision_' || {nodes_table}.user_id)
+        """)
+        conn.execute(f"DELETE FROM {nodes_table} INDEXED BY idx_{nodes_table}_bad_vision WHERE type = 'Vision' AND substr(id, 1, 7) <> 'vision_'")
 
     # --- 通用写入 ---
-    def _upsert_node(self, conn, user_id, node_id, node_type, name="", content="", status="confirmed", time_metadata=None, strategic_role=None, energy_impact=None, source_file=None, **kwargs):
+    def _node_row(self, user_id, node_id, node_type, name="", content="", status="confirmed", time_metadata=None, strategic_role=None, energy_impact=None, source_file=None, **kwargs):
+        """构造一行 _UPSERT_NODE_SQL 参数，供单条写入与 executemany 共用"""
         # [Strategic Brain] 强一致性 ID 归一化: Vision 和 Self 节点在全系统必须唯一
         if node_type == "Vision":
             node_id = f"vision_{user_id}"
@@ -235,53 +830,23 @@ class GraphStore:
         default_score = 1.0 if node_type in ["Vision", "Self"] else 0.5
         alignment_score = kwargs.pop('alignment_score', default_score)
         
-        attributes = json.dumps(kwargs, ensure_ascii=False)
-        time_meta_json = json.dumps(time_metadata, ensure_ascii=False) if time_metadata else None
-        
-        # 检查表是否有新列，如果没有则添加（为了兼容旧库）
-        try:
-            conn.execute(
-                "INSERT OR REPLACE INTO nodes (id, user_id, type, name, content, attributes, status, time_metadata, strategic_role, energy_impact, alignment_score, source_file) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (node_id, user_id, node_type, name, content, attributes, status, time_meta_json, strategic_role, energy_impact, alignment_score, source_file)
-            )
-        except sqlite3.OperationalError:
-            # 如果是旧表结构，先尝试添加列 (虽然 _init_db 应该已经处理了，但为了健壮性保留)
-            try:
-                # 尝试添加可能缺失的列
-                columns_to_add = {
-                    "status": "TEXT DEFAULT 'confirmed'",
-                    "time_metadata": "JSON",
-                    "strategic_role": "TEXT",
-                    "energy_impact": "INTEGER",
-                    "alignment_score": "REAL DEFAULT 0.0",
-                    "source_file": "TEXT"
-                }
-                for col, type_def in columns_to_add.items():
-                    try:
-                        conn.execute(f"ALTER TABLE nodes ADD COLUMN {col} {type_def}")
-                    except sqlite3.OperationalError:
-                        pass # 列可能已存在
+        attributes = _dumps(kwargs) if kwargs else _EMPTY_JSON
+        time_meta_json = _dumps(time_metadata) if time_metadata else None
+        return (node_id, user_id, node_type, name, content, attributes, status, time_meta_json, strategic_role, energy_impact, alignment_score, source_file)
 
-                # 重试插入
-                conn.execute(
-                    "INSERT OR REPLACE INTO nodes (id, user_id, type, name, content, attributes, status, time_metadata, strategic_role, energy_impact, alignment_score, source_file) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                    (node_id, user_id, node_type, name, content, attributes, status, time_meta_json, strategic_role, energy_impact, alignment_score, source_file)
-                )
-            except Exception as e:
-                logger.error(f"Schema migration failed in _upsert_node: {e}")
-                raise
+    def _upsert_node(self, conn, user_id, node_id, node_type, **kwargs):
+        conn.execute(_UPSERT_NODE_SQL, self._node_row(user_id, node_id, node_type, **kwargs))
 
     def _upsert_edge(self, conn, user_id, source, target, relation, **kwargs):
-        props = json.dumps(kwargs, ensure_ascii=False)
-        conn.execute(
-            "INSERT OR IGNORE INTO edges (source, target, relation, user_id, properties) VALUES (?, ?, ?, ?, ?)",
-            (source, target, relation, user_id, props)
-        )
+        conn.execute(_INSERT_EDGE_SQL, (source, target, relation, user_id, _dumps(kwargs) if kwargs else _EMPTY_JSON))
 
     def _ensure_tables(self):
         """确保必要的表存在，如果不存在则初始化"""
+        # _init_db 成功后表结构已就绪，稳态下写操作无需再探测 sqlite_master
+        if self._tables_ready:
+            return
         try:
-            with self._lock, self._get_conn() as conn:
+            with self._writer_conn() as conn:
                 cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='nodes'")
                 if not cursor.fetchone():
                     logger.warning("检测到数据库表缺失，正在初始化...")
@@ -293,13 +858,13 @@ class GraphStore:
                     logger.warning("检测到 experiences 表缺失，正在初始化...")
                     self._init_db()
         except Exception as e:
-            logger.error(f"检查表结构失败: {e}")
+            logger.exception("检查表结构失败: %s", e)
 
     def sync_user_to_self_node(self, user_id: str, vision_data: Optional[Dict] = None, persona_data: Optional[Dict] = None) -> bool:
         """同步用户信息到图谱中的 Self 和 Vision 节点"""
         try:
             self._ensure_tables()
-            with self._lock, self._get_conn() as conn:
+            with self._writer_conn() as conn:
                 # 1. 确保 Self 节点存在
                 persona_attrs = persona_data if persona_data else {}
                 self_name = persona_attrs.get("name", "Self")
@@ -313,12 +878,12 @@ class GraphStore:
                     content=f"The Owner of this Endgame OS: {self_name}",
                     status="confirmed",
                     strategic_role="Owner",
-                    attributes=json.dumps({
+                    attributes=_dumps({
                         "persona": persona_attrs,
                         "traits": persona_attrs.get("traits", []),
                         "tone": persona_attrs.get("tone", "mentor"),
                         "identity": "owner"
-                    }, ensure_ascii=False)
+                    })
                 )
                 
                 # 2. 如果有愿景数据，同步 Vision 节点
@@ -339,7 +904,7 @@ class GraphStore:
                         content=vision_data.get("description", ""),
                         status="confirmed",
                         time_metadata=time_meta,
-                        attributes=json.dumps({
+                        attributes=_dumps({
                             "core_values": vision_data.get("core_values", []),
                             "milestones": vision_data.get("key_milestones", [])
                         })
@@ -350,10 +915,9 @@ class GraphStore:
                     
                     # 4. 如果有里程碑，建立 Vision -> HAS_GOAL -> Goal 关系
                     milestones = vision_data.get("key_milestones", [])
-                    for i, milestone in enumerate(milestones):
-                        goal_id = f"goal_{user_id}_{i}"
-                        self._upsert_node(
-                            conn,
+                    goal_ids = [f"goal_{user_id}_{i}" for i in range(len(milestones))]
+                    conn.executemany(_UPSERT_NODE_SQL, [
+                        self._node_row(
                             user_id,
                             goal_id,
                             "Goal",
@@ -362,25 +926,123 @@ class GraphStore:
                             status="confirmed",
                             strategic_role="Milestone"
                         )
-                        self._upsert_edge(conn, user_id, vision_id, goal_id, "HAS_GOAL")
+                        for goal_id, milestone in zip(goal_ids, milestones)
+                    ])
+                    conn.executemany(_INSERT_EDGE_SQL, [
+                        (vision_id, goal_id, "HAS_GOAL", user_id, "{}") for goal_id in goal_ids
+                    ])
                     
-            logger.info(f"User {user_id} sync to Self/Vision nodes completed.")
+            logger.info("User %s sync to Self/Vision nodes completed.", user_id)
             return True
         except Exception as e:
-            logger.error(f"Sync User to Self Node Failed: {e}")
+            logger.exception("Sync User to Self Node Failed: %s", e)
             return False
 
     # --- 核心业务接口 ---
-    def add_log(self, user_id: str, log_id: str, content: str, timestamp: str, log_type: str = "chat") -> bool:
+    def add_log(self, user_id: str, log_id: str, content: str, timestamp: str, log_type: str = "chat", sync: bool = False) -> bool:
+        """写入日志节点
+
+        默认入队后立即返回 (True 仅表示已受理)，由后台线程批量落库；需要读到刚写入的日志时
+        传 sync=True 同步写入，或之后调用 flush() 并检查其返回值
+        """
         try:
-            self._ensure_tables()
-            with self._lock, self._get_conn() as conn:
-                self._upsert_node(conn, user_id, log_id, "Log", name=log_type, content=content, timestamp=timestamp)
+            row = self._node_row(user_id, log_id, "Log", name=log_type, content=content, timestamp=timestamp)
+            if sync:
+                return self._write_log_rows([row])
+            if self._log_thread is None:
+                self._start_log_writer()
+            try:
+                self._log_q.put_nowait(row)
+            except queue.Full:
+                # 队列积压时退化为同步写入，不丢日志
+                return self._write_log_rows([row])
             return True
         except Exception as e:
-            logger.error(f"Add Log Failed: {e}")
+            logger.exception("Add Log Failed: %s", e)
             return False
 
+    def _start_log_writer(self):
+        """启动日志写线程 (每个实例至多一次)"""
+        with self._log_thread_lock:
+            if self._log_thread is not None:
+                return
+            self._log_thread = threading.Thread(target=self._log_writer_loop, name="graph-log-writer", daemon=True)
+            self._log_thread.start()
+
+    def _write_log_rows(self, rows: List[tuple]) -> bool:
+        """一次事务写入一批日志行；整批失败时逐行重试，只有确实写不进去的行计入 _log_failures"""
+        try:
+            self._ensure_tables()
+            with self._writer_conn() as conn:
+                conn.executemany(_UPSERT_NODE_SQL, rows)
+            return True
+        except Exception as e:
+            if len(rows) == 1:
+                with self._lock:
+                    self._log_failures += 1
+                logger.error("Add Log Failed: %s (%s)", rows[0][0], e)
+                return False
+            logger.warning("Add Log Batch Failed, retrying %s rows one by one: %s", len(rows), e)
+        ok = True
+        for row in rows:
+            ok = self._write_log_rows([row]) and ok
+        return ok
+
+    def _log_writer_loop(self):
+        """后台线程：取出排队的日志节点，每批最多 LOG_BATCH_SIZE 条，一次事务写入；收到 None 时退出"""
+        while True:
+            batch = [self._log_q.get()]
+            try:
+                while batch[-1] is not None and len(batch) < LOG_BATCH_SIZE:
+                    batch.append(self._log_q.get_nowait())
+            except queue.Empty:
+                pass
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    self._write_log_rows(rows)
+            finally:
+                for _ in batch:
+                    self._log_q.task_done()
+            if batch[-1] is None:
+                return
+
+    def flush(self) -> bool:
+        """
+        阻塞直到已入队的日志全部落库；上次 flush 以来有日志写入失败时返回 False。
+        不能在持有 _lock 时调用 (close() 同理)：日志线程需要写锁才能落库，会造成死锁，此时直接抛出 RuntimeError。
+        """
+        if self._lock._is_owned():
+            raise RuntimeError("GraphStore.flush() called while holding the write lock")
+        self._log_q.join()
+        with self._lock:
+            failures, self._log_failures = self._log_failures, 0
+        return failures == 0
+
+    def close(self) -> bool:
+        """清空日志队列后停止后台线程并关闭全部连接，之后实例不可再用；返回值同 flush()"""
+        if self._closed.is_set():
+            return True
+        ok = self.flush()
+        self._closed.set()
+        self._ckpt_wanted.set()
+        if self._log_thread is not None:
+            self._log_q.put(None)
+            self._log_thread.join()
+        atexit.unregister(self.close)
+        self._maintenance_thread.join()
+        self._ckpt_conn.close()
+        with self._lock:
+            self._writer.close()
+        with self._version_lock:
+            self._version_conn.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        return ok
+
     def add_person(self, user_id: str, name: str, role: str, energy_impact: int) -> bool:
         """
         [Phase 2] 新增关键人物节点
@@ -390,7 +1052,7 @@ class GraphStore:
         try:
             self._ensure_tables()
             person_id = self._get_stable_id(name)
-            with self._lock, self._get_conn() as conn:
+            with self._writer_conn() as conn:
                 self._upsert_node(
                     conn,
                     user_id,
@@ -403,112 +1065,112 @@ class GraphStore:
                 )
             return True
         except Exception as e:
-            logger.error(f"Add Person Failed: {e}")
+            logger.exception("Add Person Failed: %s", e)
             return False
 
     def add_concepts_batch(self, user_id: str, concepts: List[Dict[str, Any]]) -> bool:
+        # 空批次直接返回：不抢写锁、不开空事务，也不让读缓存失效
+        if not concepts:
+            return True
         try:
             self._ensure_tables()
-            data = []
-            for c in concepts:
-                attr = json.dumps({"vector": c.get('vector')}, ensure_ascii=False)
-                # 注意：这里只插入基本字段，不覆盖可能已存在的 Person 特殊字段
-                # 默认对齐分为 0.5 (中性)
-                data.append((c['id'], user_id, "Concept", c['name'], "", attr, 0.5))
-            with self._lock, self._get_conn() as conn:
+            # 生成器直接喂给 executemany，避免先物化整批参数元组
+            # 向量单独存入 concept_vector BLOB，attributes 只保留稀疏元数据
+            # 注意：这里只插入基本字段，不覆盖可能已存在的 Person 特殊字段
+            # 已存在的节点只更新名称与向量，类型、内容、档案保持不变；默认对齐分为 0.5 (中性)
+            data = (
+                (c['id'], user_id, "Concept", c['name'], "", "{}", 0.5, _pack_vector(c.get('vector')))
+                for c in concepts
+            )
+            with self._writer_conn() as conn:
                 conn.executemany(
-                    "INSERT OR REPLACE INTO nodes (id, user_id, type, name, content, attributes, alignment_score) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    """
+                    INSERT INTO nodes (id, user_id, type, name, content, attributes, alignment_score, concept_vector) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        name = excluded.name,
+                        concept_vector = coalesce(excluded.concept_vector, nodes.concept_vector)
+                    """,
                     data
                 )
             return True
         except Exception: return False
 
     def add_mentions_batch(self, user_id: str, relations: List[Tuple[str, str]]) -> bool:
+        if not relations:
+            return True
         try:
             self._ensure_tables()
-            data = [(src, tgt, "MENTIONS", user_id, "{}") for src, tgt in relations]
-            with self._lock, self._get_conn() as conn:
+            # 同一日志对同一概念的重复提及只写一次 (保持首次出现的顺序)，不让 SQLite 逐条探测主键后忽略
+            data = [(src, tgt, "MENTIONS", user_id, "{}") for src, tgt in dict.fromkeys(relations)]
+            with self._writer_conn() as conn:
                 conn.executemany(
-                    "INSERT OR IGNORE INTO edges (source, target, relation, user_id, properties) VALUES (?, ?, ?, ?, ?)",
+                    _INSERT_EDGE_SQL,
                     data
                 )
             return True
         except Exception: return False
 
     def upsert_entities_batch(self, user_id: str, entities: List[Dict[str, Any]]) -> bool:
-        """批量更新实体及其元数据，支持档案深度合并"""
+        """批量更新实体及其元数据，支持档案深度合并 (合并在 SQLite JSON1 中完成)"""
+        if not entities:
+            return True
         try:
             self._ensure_tables()
-            with self._lock, self._get_conn() as conn:
-                for e in entities:
-                    name = e.get("name")
-                    if not name: continue
-                    
-                    node_type = e.get("type", "Concept")
-                    
-                    # [Strategic Brain] 强一致性 ID 归一化
-                    if node_type == "Vision":
-                        node_id = f"vision_{user_id}"
-                    elif node_type == "Self":
-                        node_id = user_id
-                    else:
-                        node_id = self._get_stable_id(name)
-                        
-                    content = e.get("content", "")
-                    new_dossier = e.get("dossier", {})
-                    
-                    # 1. 获取现有属性
-                    cursor = conn.execute("SELECT attributes FROM nodes WHERE id = ? AND user_id = ?", (node_id, user_id))
-                    row = cursor.fetchone()
-                    
-                    current_attrs = {}
-                    if row and row['attributes']:
-                        try:
-                            current_attrs = json.loads(row['attributes'])
-                        except: pass
-                    
-                    # 2. 合并档案信息 (Dossier)
-                    if "dossier" not in current_attrs:
-                        current_attrs["dossier"] = {}
-                    
-                    # 深度合并逻辑：更新或添加新字段
-                    if isinstance(new_dossier, dict):
-                        for k, v in new_dossier.items():
-                            if isinstance(v, list) and k in current_attrs["dossier"] and isinstance(current_attrs["dossier"][k], list):
-                                # 列表类型：去重合并
-                                current_attrs["dossier"][k] = list(set(current_attrs["dossier"][k] + v))
-                            else:
-                                # 其他类型：直接更新
-                                current_attrs["dossier"][k] = v
+            rows = []
+            for e in entities:
+                name = e.get("name")
+                if not name: continue
+                
+                node_type = e.get("type", "Concept")
+                
+                # [Strategic Brain] 强一致性 ID 归一化
+                if node_type == "Vision":
+                    node_id = f"vision_{user_id}"
+                elif node_type == "Self":
+                    node_id = user_id
+                else:
+                    node_id = self._get_stable_id(name)
                     
-                    # 3. 执行更新或插入
-                    attr_json = json.dumps(current_attrs, ensure_ascii=False)
-                    status = e.get("status", "confirmed")
-                    energy_impact = e.get("energy_impact", 0)
-                    alignment_score = e.get("alignment_score", 0.5)
-
-                    conn.execute("""
-                        INSERT INTO nodes (id, user_id, type, name, content, attributes, status, energy_impact, alignment_score)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT(id) DO UPDATE SET
-                            type = excluded.type,
-                            content = CASE WHEN excluded.content != '' THEN excluded.content ELSE nodes.content END,
-                            attributes = excluded.attributes,
-                            status = excluded.status,
-                            energy_impact = excluded.energy_impact,
-                            alignment_score = excluded.alignment_score
-                    """, (node_id, user_id, node_type, name, content, attr_json, status, energy_impact, alignment_score))
+                new_dossier = e.get("dossier", {})
+                if not isinstance(new_dossier, dict):
+                    new_dossier = {}
+
+                rows.append((
+                    len(rows), node_id, user_id, node_type, name, e.get("content", ""),
+                    _dumps(new_dossier),
+                    e.get("status", "confirmed"), e.get("energy_impact", 0), e.get("alignment_score", 0.5)
+                ))
+            if not rows:
+                return True
+
+            with self._writer_conn() as conn:
+                # 1. 整批写入临时表 (写连接常驻，临时表只需创建一次)
+                conn.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS _entity_batch (
+                        seq INTEGER PRIMARY KEY, id TEXT, user_id TEXT, type TEXT, name TEXT, content TEXT,
+                        dossier TEXT, status TEXT, energy_impact INTEGER, alignment_score REAL
+                    )
+                """)
+                conn.execute("DELETE FROM _entity_batch")
+                conn.executemany("INSERT INTO _entity_batch VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                # 2. 一条语句完成插入或档案合并；按 seq 顺序执行，同批重复实体依次叠加
+                conn.execute(_UPSERT_ENTITIES_SQL)
+                conn.execute("DELETE FROM _entity_batch")
                 
             return True
         except Exception as e:
-            logger.error(f"Upsert Entities Batch Failed: {e}")
+            logger.exception("Upsert Entities Batch Failed: %s", e)
             return False
 
     def upsert_relations_batch(self, user_id: str, relations: List[Dict[str, Any]]) -> bool:
         """批量更新关系及其属性"""
+        if not relations:
+            return True
         try:
             self._ensure_tables()
             edge_data = []
+            # 批次内名称 -> ID 映射：同名实体在一批关系中反复出现，只生成一次 ID
+            local_ids = {}
             for r in relations:
                 src_name = r.get("source")
                 tgt_name = r.get("target")
@@ -516,84 +1178,104 @@ class GraphStore:
                 
                 if not src_name or not tgt_name or not rel: continue
                 
-                src_id = self._get_stable_id(src_name)
-                tgt_id = self._get_stable_id(tgt_name)
+                src_id = local_ids.get(src_name) or local_ids.setdefault(src_name, self._get_stable_id(src_name))
+                tgt_id = local_ids.get(tgt_name) or local_ids.setdefault(tgt_name, self._get_stable_id(tgt_name))
                 
                 # 准备边数据
-                edge_data.append((src_id, tgt_id, rel, user_id, json.dumps(r.get("properties", {}))))
+                edge_data.append((src_id, tgt_id, rel, user_id, _dumps(r["properties"]) if r.get("properties") else "{}"))
+            # 整批都被过滤掉 (缺少端点或关系名) 时不开空事务
+            if not edge_data:
+                return True
             
-            with self._lock, self._get_conn() as conn:
+            with self._writer_conn() as conn:
                 conn.executemany(
-                    "INSERT OR IGNORE INTO edges (source, target, relation, user_id, properties) VALUES (?, ?, ?, ?, ?)",
+                    _INSERT_EDGE_SQL,
                     edge_data
                 )
             return True
         except Exception as e:
-            logger.error(f"Upsert Relations Batch Failed: {e}")
+            logger.exception("Upsert Relations Batch Failed: %s", e)
             return False
 
     def add_triplets_batch(self, user_id: str, triplets: List[Tuple[str, str, str]]) -> bool:
         """批量添加三元组 (subj, rel, obj)"""
+        if not triplets:
+            return True
         try:
-            node_data = []
-            edge_data = []
-            
+            # 批次内去重：按 ID 收集节点、按 (source, target, relation) 收集边，
+            # 同一实体在一批三元组中反复出现时只向 executemany 提交一行 (与 INSERT OR IGNORE 一样先到先得)
+            node_data = {}
+            edge_data = {}
+            # 批次内名称 -> ID 映射：NLP 抽取的三元组主语大量重复，只生成一次 ID
+            local_ids = {}
             for subj, rel, obj in triplets:
                 if not subj or not obj or not rel: continue
-                
-                subj_id = self._get_stable_id(subj)
-                obj_id = self._get_stable_id(obj)
-                
-                # 准备节点数据 (Concept)，默认对齐分 0.5
-                node_data.append((subj_id, user_id, "Concept", subj, "", "{}", 0.5))
-                node_data.append((obj_id, user_id, "Concept", obj, "", "{}", 0.5))
-                
+
+                subj_id = local_ids.get(subj) or local_ids.setdefault(subj, self._get_stable_id(subj))
+                obj_id = local_ids.get(obj) or local_ids.setdefault(obj, self._get_stable_id(obj))
+
                 # 准备边数据
-                edge_data.append((subj_id, obj_id, rel, user_id, "{}"))
+                edge_data.setdefault((subj_id, obj_id, rel), (subj_id, obj_id, rel, user_id, "{}"))
+
+                # 准备节点数据 (Concept)，默认对齐分 0.5
+                if subj_id not in node_data:
+                    node_data[subj_id] = (subj_id, user_id, "Concept", subj, "", "{}", 0.5)
+                if obj_id not in node_data:
+                    node_data[obj_id] = (obj_id, user_id, "Concept", obj, "", "{}", 0.5)
             
-            with self._lock, self._get_conn() as conn:
+            with self._writer_conn() as conn:
                 # 批量插入节点 (IGNORE 如果已存在)
                 conn.executemany(
                     "INSERT OR IGNORE INTO nodes (id, user_id, type, name, content, attributes, alignment_score) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    node_data
+                    node_data.values()
                 )
                 # 批量插入边
                 conn.executemany(
-                    "INSERT OR IGNORE INTO edges (source, target, relation, user_id, properties) VALUES (?, ?, ?, ?, ?)",
-                    edge_data
+                    _INSERT_EDGE_SQL,
+                    edge_data.values()
                 )
             return True
         except Exception as e:
-            logger.error(f"Add Triplets Batch Failed: {e}")
+            logger.exception("Add Triplets Batch Failed: %s", e)
             return False
 
     def add_experience(self, user_id: str, exp_id: str, trigger: str, insight: str, strategy: str) -> bool:
         """记录一条进化出来的经验"""
         try:
             self._ensure_tables()
-            with self._lock, self._get_conn() as conn:
+            with self._writer_conn() as conn:
                 conn.execute(
-                    "INSERT OR REPLACE INTO experiences (id, user_id, trigger_scenario, insight, strategy) VALUES (?, ?, ?, ?, ?)",
+                    """
+                    INSERT INTO experiences (id, user_id, trigger_scenario, insight, strategy) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        trigger_scenario = excluded.trigger_scenario, insight = excluded.insight, strategy = excluded.strategy
+                    """,
                     (exp_id, user_id, trigger, insight, strategy)
                 )
             return True
         except Exception as e:
-            logger.error(f"添加经验失败: {e}")
+            logger.exception("添加经验失败: %s", e)
             return False
 
     def get_all_experiences(self, user_id: str) -> List[Dict[str, Any]]:
         """获取用户的所有经验"""
         try:
-            with self._get_conn() as conn:
-                rows = conn.execute("SELECT * FROM experiences WHERE user_id = ?", (user_id,)).fetchall()
-                return [dict(row) for row in rows]
+            with self._reader_conn(row=False) as conn:
+                rows = conn.execute(
+                    "SELECT id, user_id, trigger_scenario, insight, strategy, created_at FROM experiences WHERE user_id = ?",
+                    (user_id,)
+                ).fetchall()
+            return [
+                {"id": r[0], "user_id": r[1], "trigger_scenario": r[2], "insight": r[3], "strategy": r[4], "created_at": r[5]}
+                for r in rows
+            ]
         except Exception: return []
 
     # --- 查询接口 ---
     def get_strategic_context(self, user_id: str) -> str:
         """获取当前活跃的战略上下文 (Vision, Goals, Projects) 以便 LLM 归位"""
         try:
-            with self._get_conn() as conn:
+            with self._reader_conn(row=False) as conn:
                 # 获取 Vision, Goal, Project 类型的节点
                 cursor = conn.execute("""
                     SELECT type, name, content FROM nodes 
@@ -605,189 +1287,58 @@ class GraphStore:
                 if not rows:
                     return "目前没有已确定的战略目标或项目。"
                 
-                context_parts = []
-                for row in rows:
-                    context_parts.append(f"[{row['type']}] {row['name']}: {row['content'][:100]}")
-                
-                return "\n".join(context_parts)
+                return "\n".join(f"[{ntype}] {name}: {content[:100]}" for ntype, name, content in rows)
         except Exception as e:
-            logger.error(f"Failed to get strategic context: {e}")
+            logger.exception("Failed to get strategic context: %s", e)
             return ""
 
-    def get_all_graph_data(self, user_id: str = "default_user", view_type: str = "global", *args, **kwargs) -> Dict[str, Any]:
-        """优化：获取特定用户的图谱数据用于前端可视化"""
+    def get_all_graph_data(self, user_id: str = "default_user", view_type: str = "global", *args,
+                           include_details: bool = True, mutable: bool = False, **kwargs) -> Dict[str, Any]:
+        """优化：获取特定用户的图谱数据用于前端可视化
+
+        include_details=False 时节点不带 attributes / data，跳过逐节点的 JSON 解析与显示数据构造；
+        返回值与读缓存共享，只读使用，需要修改时传 mutable=True
+        """
         # 兼容性处理
         actual_user_id = user_id
         if not actual_user_id and args:
             actual_user_id = args[0]
-            
+        return self._cached_read(
+            ("graph", actual_user_id, view_type, include_details),
+            lambda: self._load_graph_data(actual_user_id, view_type, include_details),
+            mutable
+        )
+
+    def _load_graph_data(self, actual_user_id: str, view_type: str, include_details: bool) -> Dict[str, Any]:
         try:
             nodes = []
             links = []
             
-            with self._get_conn() as conn:
-                # 1. 根据视图模式构建节点查询
-                query_params = [actual_user_id]
-                base_query = "SELECT id, type, name, content, attributes, strategic_role, energy_impact, alignment_score FROM nodes WHERE user_id=?"
-                
-                if view_type == 'strategic':
-                    # 战略模式：只显示执行层级 (Vision -> Action) + Self 节点
-                    base_query += " AND type IN ('Vision', 'Goal', 'Project', 'Task', 'Action', 'Self', 'Insight')"
-                    base_query += " ORDER BY CASE type WHEN 'Self' THEN 0 WHEN 'Vision' THEN 1 WHEN 'Goal' THEN 2 WHEN 'Project' THEN 3 WHEN 'Task' THEN 4 WHEN 'Insight' THEN 5 ELSE 6 END, created_at DESC"
-                    limit = 1000
-                elif view_type == 'people' or view_type == 'social':
-                    # 社交觉醒模式：只显示人与组织 + Self 节点
-                    base_query += " AND type IN ('Person', 'Organization', 'Self')"
-                    base_query += " ORDER BY CASE type WHEN 'Self' THEN 0 ELSE 1 END, energy_impact DESC, created_at DESC"
-                    limit = 1000
-                elif view_type == 'staging':
-                    # 暂存模式 (Memory Airlock): 从暂存表读取数据
-                    base_query = "SELECT id, type, name, content, attributes, NULL as strategic_role, NULL as energy_impact, 0 as alignment_score FROM staging_nodes WHERE user_id=?"
-                    base_query += " ORDER BY created_at DESC"
-                    limit = 1000
-                else:
-                    # 全局模式：全量数据，优先高权重
-                    base_query += " ORDER BY energy_impact DESC, created_at DESC"
-                    limit = 2000 # 提升上限
-                
-                base_query += f" LIMIT {limit}"
-                
-                rows = conn.execute(base_query, query_params).fetchall()
-                node_ids = set()
-                
-                for r in rows:
-                    node_ids.add(r['id'])
-                    # Group 映射逻辑 (v3.0 优化)
-                    if r['type'] == 'Self': group = 1
-                    elif r['type'] in ('Vision', 'Goal'): group = 2
-                    elif r['type'] == 'Person': group = 3
-                    elif r['type'] == 'Organization': group = 4
-                    elif r['type'] in ('Project', 'Task'): group = 5
-                    elif r['type'] == 'Insight': group = 6
-                    else: group = 7
-                    
-                    # 准备前端显示数据
-                    display_data = {
-                        "类型": r['type'],
-                        "描述": r['content'] or "无详细内容"
-                    }
-                    
-                    # Phase 2: 显示战略属性
-                    if r['strategic_role']:
-                        display_data["战略角色"] = r['strategic_role']
-                    if r['energy_impact']:
-                        display_data["能量影响"] = str(r['energy_impact'])
-                    
-                    # 如果有档案信息，也加入显示
-                    attrs = json.loads(r['attributes']) if r['attributes'] else {}
-                    dossier = attrs.get('dossier', {})
-                    if dossier:
-                        for k, v in dossier.items():
-                            key_name = f"档案_{k}"
-                            if isinstance(v, list):
-                                display_data[key_name] = ", ".join(v)
-                            else:
-                                display_data[key_name] = str(v)
-
-                    nodes.append({
-                        "id": r['id'],
-                        "label": r['name'] or (r['content'][:20] if r['content'] else "Unknown"),
-                        "group": group,
-                        "type": r['type'],
-                        "content": r['content'],
-                        "attributes": attrs,
-                        "data": display_data,
-                        "alignment_score": r['alignment_score']
-                    })
+            with self._reader_conn(row=False) as conn:
+                # 1. 按视图模式取预先拼好的查询，节点与关联边一次往返取回
+                if view_type not in _GRAPH_NODE_QUERIES:
+                    view_type = 'global'
+                query = _GRAPH_FUSED_QUERIES[view_type]
+                # 按批从游标取行，节点行当场转换为 dict，不再先物化一份原始行列表
+                build_node = _graph_node if include_details else _graph_node_brief
+                e_rows, node_ids = [], set()
+                cursor = conn.execute(query, (actual_user_id, actual_user_id, actual_user_id))
+                while batch := cursor.fetchmany(500):
+                    for r in batch:
+                        if r[0] == 'N':
+                            nodes.append(build_node(r[1:10]))
+                            node_ids.add(r[1])
+                        else:
+                            e_rows.append(r[10:])
 
                 # 2. 获取该用户的边 (自动补全邻居节点)
                 if node_ids:
-                    placeholders = ','.join('?' * len(node_ids))
-                    
-                    # 选择边表
-                    edge_table = "staging_edges" if view_type == 'staging' else "edges"
-                    node_table = "staging_nodes" if view_type == 'staging' else "nodes"
-                    
-                    # 查询所有关联边
-                    query = f"""
-                        SELECT source, target, relation 
-                        FROM {edge_table} 
-                        WHERE user_id=? AND (source IN ({placeholders}) OR target IN ({placeholders}))
-                        ORDER BY created_at DESC
-                        LIMIT 5000
-                    """
-                    params = [actual_user_id] + list(node_ids) + list(node_ids)
-                    e_rows = conn.execute(query, params).fetchall()
-                    
-                    existing_ids = node_ids.copy()
-                    for r in e_rows:
-                        # 补全缺失的节点 (Ghost Nodes)
-                        if r['target'] not in existing_ids:
-                            # 尝试查询该节点详情，而不是直接作为 Ghost
-                            target_node_row = conn.execute(
-                                f"SELECT id, type, name, content, attributes, {'0 as alignment_score' if view_type == 'staging' else 'alignment_score'} FROM {node_table} WHERE id=?", 
-                                (r['target'],)
-                            ).fetchone()
-                            
-                            if target_node_row:
-                                # 使用相同的 Group 映射逻辑
-                                t_type = target_node_row['type']
-                                if t_type == 'Self': t_group = 1
-                                elif t_type in ('Vision', 'Goal'): t_group = 2
-                                elif t_type == 'Person': t_group = 3
-                                elif t_type == 'Organization': t_group = 4
-                                elif t_type in ('Project', 'Task'): t_group = 5
-                                elif t_type == 'Insight': t_group = 6
-                                else: t_group = 7
-
-                                nodes.append({
-                                    "id": target_node_row['id'],
-                                    "label": target_node_row['name'] or "Unknown",
-                                    "group": t_group,
-                                    "type": t_type,
-                                    "content": target_node_row['content'],
-                                    "alignment_score": target_node_row['alignment_score']
-                                })
-                            else:
-                                nodes.append({"id": r['target'], "label": r['target'], "group": 7, "type": "Concept (Linked)"})
-                            existing_ids.add(r['target'])
-
-                        if r['source'] not in existing_ids:
-                             # 尝试查询该节点详情
-                            source_node_row = conn.execute(
-                                f"SELECT id, type, name, content, attributes, {'0 as alignment_score' if view_type == 'staging' else 'alignment_score'} FROM {node_table} WHERE id=?", 
-                                (r['source'],)
-                            ).fetchone()
-                            
-                            if source_node_row:
-                                # 使用相同的 Group 映射逻辑
-                                s_type = source_node_row['type']
-                                if s_type == 'Self': s_group = 1
-                                elif s_type in ('Vision', 'Goal'): s_group = 2
-                                elif s_type == 'Person': s_group = 3
-                                elif s_type == 'Organization': s_group = 4
-                                elif s_type in ('Project', 'Task'): s_group = 5
-                                elif s_type == 'Insight': s_group = 6
-                                else: s_group = 7
-
-                                nodes.append({
-                                    "id": source_node_row['id'],
-                                    "label": source_node_row['name'] or "Unknown",
-                                    "group": s_group,
-                                    "type": s_type,
-                                    "content": source_node_row['content'],
-                                    "alignment_score": source_node_row['alignment_score']
-                                })
-                            else:
-                                nodes.append({"id": r['source'], "label": r['source'], "group": 7, "type": "Concept (Linked)"})
-                            existing_ids.add(r['source'])
-                            
-                        links.append({
-                            "source": r['source'],
-                            "target": r['target'],
-                            "value": 1,
-                            "type": r['relation']
-                        })
+                    nodes.extend(_fetch_ghost_nodes(conn, view_type, e_rows, node_ids))
+
+                    links = [
+                        {"source": source, "target": target, "value": 1, "type": relation}
+                        for source, target, relation in e_rows
+                    ]
 
             return {
                 "nodes": nodes,
@@ -796,30 +1347,80 @@ class GraphStore:
                 "total_links": len(links)
             }
         except Exception as e:
-            logger.error(f"Get Graph Data Error: {e}")
+            logger.exception("Get Graph Data Error: %s", e)
             return {"nodes": [], "links": [], "error": str(e)}
 
-    def get_stats(self, user_id: str = "default_user", *args, **kwargs) -> Dict[str, Any]:
+    def get_graph_columns(self, user_id: str, view_type: str = "global") -> Dict[str, Any]:
+        """列式图谱数据：每个字段一个数组，大图可视化可直接序列化，省去逐节点构造 dict
+
+        与 get_all_graph_data 使用相同的视图查询与 Ghost 补全 (_fetch_ghost_nodes)，节点与边的内容和顺序一致，不附带 attributes
+        """
+        try:
+            if view_type not in _GRAPH_NODE_QUERIES:
+                view_type = 'global'
+            ids, types, labels, contents, scores, groups = [], [], [], [], [], []
+            edge_rows = []
+            with self._reader_conn(row=False) as conn:
+                for r in conn.execute(_GRAPH_FUSED_QUERIES[view_type], (user_id, user_id, user_id)):
+                    if r[0] == 'N':
+                        nid, ntype, name, content, _, _, _, alignment_score, group = r[1:10]
+                        ids.append(nid); types.append(ntype); contents.append(content); scores.append(alignment_score); groups.append(group)
+                        labels.append(name or (content[:20] if content else "Unknown"))
+                    else:
+                        edge_rows.append(r[10:])
+
+                if ids:
+                    ghosts = _fetch_ghost_nodes(conn, view_type, edge_rows, set(ids))
+                else:
+                    # 与 get_all_graph_data 一致：当前视图没有节点时不返回边
+                    ghosts, edge_rows = [], []
+            for g in ghosts:
+                ids.append(g["id"]); types.append(g["type"]); labels.append(g["label"]); groups.append(g["group"])
+                contents.append(g.get("content")); scores.append(g.get("alignment_score"))
+
+            return {
+                "nodes": {
+                    "id": ids,
+                    "type": types,
+                    "label": labels,
+                    "group": groups,
+                    "content": contents,
+                    "alignment_score": scores,
+                },
+                "links": {
+                    "source": [e[0] for e in edge_rows],
+                    "target": [e[1] for e in edge_rows],
+                    "type": [e[2] for e in edge_rows],
+                },
+                "total_nodes": len(ids),
+                "total_links": len(edge_rows)
+            }
+        except Exception as e:
+            logger.exception("Get Graph Columns Error: %s", e)
+            return {"nodes": {}, "links": {}, "total_nodes": 0, "total_links": 0, "error": str(e)}
+
+    def get_stats(self, user_id: str = "default_user", *args, mutable: bool = False, **kwargs) -> Dict[str, Any]:
+        """统计信息；返回值与读缓存共享，只读使用，需要修改时传 mutable=True"""
         # 兼容性处理
         actual_user_id = user_id
         if not actual_user_id and args:
             actual_user_id = args[0]
-            
+        return self._cached_read(("stats", actual_user_id), lambda: self._load_stats(actual_user_id), mutable)
+
+    def _load_stats(self, actual_user_id: str) -> Dict[str, Any]:
         try:
-            with self._get_conn() as conn:
-                n = conn.execute("SELECT COUNT(*) FROM nodes WHERE user_id=?", (actual_user_id,)).fetchone()[0]
-                e = conn.execute("SELECT COUNT(*) FROM edges WHERE user_id=?", (actual_user_id,)).fetchone()[0]
-                
-                # 增加各类型节点的统计
-                type_counts = conn.execute(
-                    "SELECT type, COUNT(*) as count FROM nodes WHERE user_id=? GROUP BY type", 
+            with self._reader_conn(row=False) as conn:
+                # 各类型节点的统计只扫描一次 nodes，总数由分组计数求和得到
+                type_counts = dict(conn.execute(
+                    "SELECT type, COUNT(*) FROM nodes WHERE user_id=? GROUP BY type",
                     (actual_user_id,)
-                ).fetchall()
+                ).fetchall())
+                e = conn.execute("SELECT COUNT(*) FROM edges WHERE user_id=?", (actual_user_id,)).fetchone()[0]
                 
                 return {
                     "node_counts": {
-                        "total": n,
-                        **{row["type"]: row["count"] for row in type_counts}
+                        "total": sum(type_counts.values()),
+                        **type_counts
                     },
                     "relation_counts": {"total": e}
                 }
@@ -828,20 +1429,23 @@ class GraphStore:
     def get_nodes_by_type(self, user_id: str, node_type: str) -> List[Dict[str, Any]]:
         """获取特定类型的节点"""
         try:
-            with self._get_conn() as conn:
-                rows = conn.execute(
-                    "SELECT id, type, name, content, attributes FROM nodes WHERE user_id=? AND type=?",
-                    (user_id, node_type)
-                ).fetchall()
-                return [dict(row) for row in rows]
+            with self._reader_conn(row=False) as conn:
+                # 普通元组按位置解包，跳过 sqlite3.Row 的按列取值开销
+                return [
+                    {"id": nid, "type": ntype, "name": name, "content": content, "attributes": attributes}
+                    for nid, ntype, name, content, attributes in conn.execute(
+                        "SELECT id, type, name, content, attributes FROM nodes WHERE user_id=? AND type=?",
+                        (user_id, node_type)
+                    )
+                ]
         except Exception as e:
-            logger.error(f"Get Nodes By Type Failed: {e}")
+            logger.exception("Get Nodes By Type Failed: %s", e)
             return []
 
     def get_sub_entities(self, user_id: str, parent_id: str, relation_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """获取子实体（如目标下的项目，项目下的任务）"""
         try:
-            with self._get_conn() as conn:
+            with self._reader_conn(row=False) as conn:
                 query = """
                     SELECT n.id, n.type, n.name, n.content, n.attributes, e.relation
                     FROM nodes n
@@ -853,16 +1457,41 @@ class GraphStore:
                     query += " AND e.relation = ?"
                     params.append(relation_type)
                 
-                rows = conn.execute(query, params).fetchall()
-                return [dict(row) for row in rows]
+                return [
+                    {"id": nid, "type": ntype, "name": name, "content": content, "attributes": attributes, "relation": relation}
+                    for nid, ntype, name, content, attributes, relation in conn.execute(query, params)
+                ]
         except Exception as e:
-            logger.error(f"Get Sub Entities Failed: {e}")
+            logger.exception("Get Sub Entities Failed: %s", e)
             return []
 
+    def get_pending_id_renames(self) -> Dict[str, str]:
+        """返回稳定 ID 迁移留下、尚未同步到向量库的 旧ID -> 新ID 映射"""
+        try:
+            with self._reader_conn(row=False) as conn:
+                return dict(conn.execute("SELECT old_id, new_id FROM stable_id_renames").fetchall())
+        except Exception as e:
+            logger.error("Get pending id renames failed: %s", e)
+            return {}
+
+    def clear_id_renames(self, old_ids: List[str]) -> bool:
+        """向量库改名完成后清除对应的映射记录"""
+        if not old_ids:
+            return True
+        try:
+            with self._writer_conn() as conn:
+                conn.executemany("DELETE FROM stable_id_renames WHERE old_id = ?", ((i,) for i in old_ids))
+            return True
+        except Exception as e:
+            logger.error("Clear id renames failed: %s", e)
+            return False
+
     def clear_all_data(self, user_id: str = None):
         """清空数据：如果提供 user_id 则只清空该用户的数据，否则清空全部"""
         try:
-            with self._lock, self._get_conn() as conn:
+            # 先让排队中的日志落库，避免清空之后又被写回
+            self.flush()
+            with self._writer_conn() as conn:
                 if user_id:
                     # 1. 清空图谱数据 (Nodes & Edges)
                     conn.execute("DELETE FROM edges WHERE user_id=?", (user_id,))
@@ -875,7 +1504,7 @@ class GraphStore:
                     conn.execute("DELETE FROM h3_energy WHERE user_id=?", (user_id,))
                     conn.execute("DELETE FROM h3_calibrations WHERE user_id=?", (user_id,))
                     
-                    logger.info(f"用户 {user_id} 的所有 SQLite 数据(Graph, Exp, H3)已清空")
+                    logger.info("用户 %s 的所有 SQLite 数据(Graph, Exp, H3)已清空", user_id)
                 else:
                     conn.execute("DELETE FROM edges")
                     conn.execute("DELETE FROM nodes")
@@ -884,23 +1513,26 @@ class GraphStore:
                     conn.execute("DELETE FROM h3_calibrations")
                     logger.info("所有 SQLite 数据已清空")
         except Exception as e:
-            logger.error(f"Clear data failed: {e}")
+            logger.exception("Clear data failed: %s", e)
 
     def clear_graph_only(self, user_id: str):
         """仅清空图谱节点和关系"""
         try:
-            with self._lock, self._get_conn() as conn:
+            self.flush()
+            with self._writer_conn() as conn:
                 conn.execute("DELETE FROM edges WHERE user_id=?", (user_id,))
                 conn.execute("DELETE FROM nodes WHERE user_id=?", (user_id,))
-                logger.info(f"用户 {user_id} 的知识图谱数据已清空")
+                logger.info("用户 %s 的知识图谱数据已清空", user_id)
         except Exception as e:
-            logger.error(f"Clear graph only failed: {e}")
+            logger.exception("Clear graph only failed: %s", e)
 
     # --- Memory Airlock (暂存区) 接口 ---
     def add_to_staging(self, user_id: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], source_file: str = "") -> bool:
         """将提取的数据加入暂存区"""
+        if not nodes and not edges:
+            return True
         try:
-            with self._lock, self._get_conn() as conn:
+            with self._writer_conn() as conn:
                 # 插入节点
                 node_data = []
                 for n in nodes:
@@ -920,7 +1552,7 @@ class GraphStore:
                         ntype,
                         n.get("name", "Unknown"),
                         n.get("content", ""),
-                        json.dumps(n.get("attributes", {}), ensure_ascii=False),
+                        _dumps(n["attributes"]) if n.get("attributes") else "{}",
                         "pending",
                         source_file
                     ))
@@ -945,7 +1577,7 @@ class GraphStore:
                         tgt,
                         e.get("relation"),
                         user_id,
-                        json.dumps(e.get("properties", {}), ensure_ascii=False)
+                        _dumps(e["properties"]) if e.get("properties") else "{}"
                     ))
                 
                 if edge_data:
@@ -956,44 +1588,24 @@ class GraphStore:
                 
             return True
         except Exception as e:
-            logger.error(f"Add to staging failed: {e}")
+            logger.exception("Add to staging failed: %s", e)
             return False
 
     def get_staging_data(self, user_id: str) -> Dict[str, Any]:
         """获取暂存区数据，并进行格式转换以兼容前端可视化"""
         try:
-            with self._get_conn() as conn:
-                rows = conn.execute("SELECT * FROM staging_nodes WHERE user_id = ?", (user_id,)).fetchall()
-                e_rows = conn.execute("SELECT * FROM staging_edges WHERE user_id = ?", (user_id,)).fetchall()
-                
-                nodes = []
-                for r in rows:
-                    # Group 映射逻辑 (v3.0 优化)
-                    if r['type'] == 'Self': group = 1
-                    elif r['type'] in ('Vision', 'Goal'): group = 2
-                    elif r['type'] == 'Person': group = 3
-                    elif r['type'] == 'Organization': group = 4
-                    elif r['type'] in ('Project', 'Task'): group = 5
-                    elif r['type'] == 'Insight': group = 6
-                    else: group = 7
-                    
-                    nodes.append({
-                        "id": r['id'],
-                        "label": r['name'] or (r['content'][:20] if r['content'] else "Unknown"),
-                        "group": group,
-                        "type": r['type'],
-                        "content": r['content'],
-                        "attributes": json.loads(r['attributes']) if r['attributes'] else {}
-                    })
-                
-                links = []
-                for e in e_rows:
-                    links.append({
-                        "source": e["source"],
-                        "target": e["target"],
-                        "type": e["relation"],
-                        "value": 1
-                    })
+            with self._reader_conn(row=False) as conn:
+                nodes = [
+                    _staging_node(r) for r in conn.execute(
+                        "SELECT id, type, name, content, attributes FROM staging_nodes WHERE user_id = ?", (user_id,)
+                    )
+                ]
+                links = [
+                    {"source": source, "target": target, "type": relation, "value": 1}
+                    for source, target, relation in conn.execute(
+                        "SELECT source, target, relation FROM staging_edges WHERE user_id = ?", (user_id,)
+                    )
+                ]
                 
                 return {
                     "nodes": nodes,
@@ -1002,13 +1614,13 @@ class GraphStore:
                     "total_links": len(links)
                 }
         except Exception as e:
-            logger.error(f"Get staging data failed: {e}")
+            logger.exception("Get staging data failed: %s", e)
             return {"nodes": [], "links": []}
 
     def clear_staging(self, user_id: str) -> bool:
         """清空暂存区"""
         try:
-            with self._lock, self._get_conn() as conn:
+            with self._writer_conn() as conn:
                 conn.execute("DELETE FROM staging_nodes WHERE user_id = ?", (user_id,))
                 conn.execute("DELETE FROM staging_edges WHERE user_id = ?", (user_id,))
             return True
@@ -26,6 +26,8 @@ class MemoryService:
             
         self.vector_store = VectorStore(persist_directory=persist_directory)
         self.graph_store = GraphStore(db_path=graph_db_path)
+        # 图谱的稳定 ID 迁移只改写 SQLite，向量库中同名键在此补齐
+        self._sync_vector_ids()
         # FileProcessor 移除，交由 IngestionService 管理
         # 感知层：只负责模型推理
         self.neural_processor = get_processor()
@@ -34,6 +36,12 @@ class MemoryService:
         self.core_keywords = MemoryConfig.CORE_KEYWORDS
         logger.info("MemoryService (Cognitive Center) 就绪")
 
+    def _sync_vector_ids(self):
+        """把 GraphStore 稳定 ID 迁移留下的改名映射应用到向量库；失败时保留映射，下次启动重试"""
+        id_map = self.graph_store.get_pending_id_renames()
+        if id_map and self.vector_store.rename_ids(id_map):
+            self.graph_store.clear_id_renames(list(id_map))
+
     def clear_all_memories(self, user_id: str = None):
         """清空记忆：如果提供 user_id 则只清空该用户的数据，否则清空全部"""
         self.vector_store.clear_all_data() # ChromaDB 目前全局清空，后续可优化
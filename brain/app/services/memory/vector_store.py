@@ -121,6 +121,35 @@ class VectorStore:
                 except Exception: pass
             return False
 
+    def rename_ids(self, id_map: Dict[str, str]) -> bool:
+        """按 旧ID -> 新ID 映射为记忆与概念集合中的向量改名 (稳定 ID 迁移后由 MemoryService 调用)
+
+        新 ID 已存在时保留现有向量，只删除旧条目；不存在的旧 ID 直接跳过
+        """
+        if not id_map:
+            return True
+        try:
+            old_ids = list(id_map)
+            for collection in (self.collection, self.concept_collection):
+                found = collection.get(ids=old_ids, include=["embeddings", "documents", "metadatas"])
+                if not found['ids']:
+                    continue
+                existing = set(collection.get(ids=[id_map[i] for i in found['ids']], include=[])['ids'])
+                keep = [k for k, old_id in enumerate(found['ids']) if id_map[old_id] not in existing]
+                if keep:
+                    collection.add(
+                        ids=[id_map[found['ids'][k]] for k in keep],
+                        embeddings=[found['embeddings'][k] for k in keep],
+                        documents=[found['documents'][k] for k in keep],
+                        metadatas=[found['metadatas'][k] for k in keep],
+                    )
+                collection.delete(ids=found['ids'])
+                logger.info(f"{collection.name}: 已迁移 {len(found['ids'])} 个向量 ID")
+            return True
+        except Exception as e:
+            logger.error(f"向量 ID 迁移失败: {e}")
+            return False
+
     def find_similar_concept(self, vector: List[float], threshold: float = 0.85) -> Optional[Dict[str, Any]]:
         try:
             results = self.concept_collection.query(query_embeddings=[vector], n_results=1)
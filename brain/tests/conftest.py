@@ -0,0 +1,128 @@
+import sys
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+# 测试直接导入 app 包，无需安装
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.memory.graph_store import GraphStore  # noqa: E402
+
+# 旧版 (user_version = 0) 的表结构：nodes 还没有 concept_vector / type_rank 列
+LEGACY_SCHEMA = """
+    CREATE TABLE nodes (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        type TEXT NOT NULL,
+        name TEXT,
+        content TEXT,
+        attributes JSON,
+        status TEXT DEFAULT 'confirmed',
+        time_metadata JSON,
+        strategic_role TEXT,
+        energy_impact INTEGER,
+        alignment_score REAL DEFAULT 0.0,
+        source_file TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE edges (
+        source TEXT NOT NULL,
+        target TEXT NOT NULL,
+        relation TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        properties JSON,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (source, target, relation, user_id)
+    );
+    CREATE TABLE staging_nodes (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        type TEXT NOT NULL,
+        name TEXT,
+        content TEXT,
+        attributes JSON,
+        status TEXT DEFAULT 'pending',
+        source_file TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE staging_edges (
+        source TEXT NOT NULL,
+        target TEXT NOT NULL,
+        relation TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        properties JSON,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (source, target, relation, user_id)
+    );
+"""
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "brain.db")
+
+
+@pytest.fixture
+def store(db_path):
+    gs = GraphStore(db_path=db_path)
+    yield gs
+    gs.close()
+
+
+@pytest.fixture
+def legacy_db(db_path):
+    """返回一个函数：按旧版结构建库并写入 {表名: [行 dict, ...]}，供迁移测试使用"""
+    def build(tables):
+        conn = sqlite3.connect(db_path)
+        conn.executescript(LEGACY_SCHEMA)
+        for table, rows in tables.items():
+            for row in rows:
+                conn.execute(
+                    f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                    tuple(row.values()),
+                )
+        conn.commit()
+        conn.close()
+        return db_path
+    return build
+
+
+def populate(gs: GraphStore, user_id: str = "u1"):
+    """写入一份覆盖各视图的小图谱，并把 created_at 改写为按插入顺序递增的固定时间，使排序结果可复现"""
+    assert gs.sync_user_to_self_node(user_id, {"title": "V", "description": "d", "key_milestones": ["m1", "m2"]}, {"name": "Me"})
+    assert gs.add_person(user_id, "Alice", "Mentor", 1)
+    assert gs.add_person(user_id, "Bob", "Drainer", -1)
+    assert gs.add_log(user_id, "log_1", "hello", "2026-01-01", sync=True)
+    assert gs.upsert_entities_batch(user_id, [
+        {"name": "Alpha", "type": "Project", "content": "alpha project", "dossier": {"tags": ["x"], "k": 1}},
+        {"name": "Beta", "type": "Task", "dossier": {"tags": ["y"]}},
+        {"name": "Acme", "type": "Organization"},
+    ])
+    # 同名实体再次写入：档案按键合并，列表取并集
+    assert gs.upsert_entities_batch(user_id, [{"name": "Alpha", "type": "Project", "dossier": {"tags": ["x", "z"], "j": "v"}}])
+    assert gs.add_concepts_batch(user_id, [{"id": gs._get_stable_id("Gamma"), "name": "Gamma", "vector": [0.5, 0.25]}])
+    assert gs.upsert_relations_batch(user_id, [
+        {"source": "Alpha", "target": "Beta", "relation": "CONSISTS_OF"},
+        {"source": "Alice", "target": "Acme", "relation": "WORKS_AT"},
+    ])
+    assert gs.add_triplets_batch(user_id, [("Beta", "USES", "Gamma"), ("Gamma", "RELATES", "Delta")])
+    assert gs.add_mentions_batch(user_id, [("log_1", gs._get_stable_id("Alpha"))])
+    with gs._get_conn() as conn:
+        # 无名称、只有内容的节点：作为邻居 (Ghost) 出现时标签应与其他路径一致
+        gs._upsert_node(conn, user_id, "note_1", "Note", name=None, content="a note without any name")
+        gs._upsert_edge(conn, user_id, gs._get_stable_id("Alpha"), "note_1", "REFERS_TO")
+        # 指向不存在节点的边：Ghost 占位
+        gs._upsert_edge(conn, user_id, gs._get_stable_id("Beta"), "missing_node", "BLOCKED_BY")
+    assert gs.add_to_staging(user_id, [
+        {"id": "s1", "type": "Concept", "name": "S1"},
+        {"id": "s2", "type": "Project", "name": "S2", "content": "staged"},
+    ], [
+        {"source": "s1", "target": "s2", "relation": "R"},
+        {"source": "s2", "target": "s_missing", "relation": "R"},
+    ], "f.txt")
+    with gs._get_conn() as conn:
+        for table in ("nodes", "edges", "staging_nodes", "staging_edges"):
+            conn.execute(f"UPDATE {table} SET created_at = datetime('2026-01-01', '+' || rowid || ' seconds')")
+    gs._read_cache.clear()
+    return gs
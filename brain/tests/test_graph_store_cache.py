@@ -0,0 +1,67 @@
+from app.services.memory.graph_store import GraphStore
+
+U = "u1"
+
+
+def _node_ids(graph):
+    return {n["id"] for n in graph["nodes"]}
+
+
+def test_cache_invalidated_by_own_write(store):
+    assert store.add_person(U, "Alice", "Mentor", 1)
+    first = store.get_all_graph_data(user_id=U)
+    assert store.get_stats(user_id=U)["node_counts"]["total"] == 1
+
+    assert store.add_person(U, "Bob", "Partner", 1)
+    assert _node_ids(store.get_all_graph_data(user_id=U)) == _node_ids(first) | {store._get_stable_id("Bob")}
+    assert store.get_stats(user_id=U)["node_counts"]["total"] == 2
+
+
+def test_cache_invalidated_by_other_instance(store, db_path):
+    assert store.add_person(U, "Alice", "Mentor", 1)
+    assert store.get_stats(user_id=U)["node_counts"]["total"] == 1
+
+    # 同一数据库上的另一个实例 (如 ETL pipeline) 写入后，本实例的缓存同样失效
+    other = GraphStore(db_path=db_path)
+    try:
+        assert other.add_person(U, "Bob", "Partner", 1)
+    finally:
+        other.close()
+    assert store.get_stats(user_id=U)["node_counts"]["total"] == 2
+    assert store._get_stable_id("Bob") in _node_ids(store.get_all_graph_data(user_id=U))
+
+
+def test_cache_hit_returns_shared_object(store):
+    assert store.add_person(U, "Alice", "Mentor", 1)
+    first = store.get_all_graph_data(user_id=U)
+    # 命中时不再序列化 / 反序列化，直接返回缓存中的同一对象
+    assert store.get_all_graph_data(user_id=U) is first
+    assert store.get_stats(user_id=U) is store.get_stats(user_id=U)
+
+
+def test_mutable_result_is_not_shared(store):
+    assert store.add_person(U, "Alice", "Mentor", 1)
+    first = store.get_all_graph_data(user_id=U, mutable=True)
+    first["nodes"].clear()
+    first["nodes"].append({"id": "tampered"})
+
+    second = store.get_all_graph_data(user_id=U, mutable=True)
+    assert _node_ids(second) == {store._get_stable_id("Alice")}
+    second["nodes"][0]["label"] = "changed"
+    assert store.get_all_graph_data(user_id=U)["nodes"][0]["label"] == "Alice"
+    assert store.get_stats(user_id=U, mutable=True) is not store.get_stats(user_id=U)
+
+
+def test_cache_hit_skips_loader(store):
+    assert store.add_person(U, "Alice", "Mentor", 1)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert store._cached_read(("k",), loader) == {"value": 1}
+    assert store._cached_read(("k",), loader) == {"value": 1}
+    assert len(calls) == 1
+    assert store.add_person(U, "Bob", "Partner", 1)
+    assert store._cached_read(("k",), loader) == {"value": 2}
@@ -0,0 +1,47 @@
+import pytest
+
+from conftest import populate
+
+U = "u1"
+VIEWS = ("global", "strategic", "people", "staging")
+
+
+@pytest.fixture
+def graph(store):
+    return populate(store, U)
+
+
+@pytest.mark.parametrize("view", VIEWS)
+def test_graph_columns_match_graph_data(graph, view):
+    data = graph.get_all_graph_data(user_id=U, view_type=view, include_details=False)
+    columns = graph.get_graph_columns(U, view)
+    assert "error" not in data and "error" not in columns
+
+    fields = ("id", "type", "label", "group", "content", "alignment_score")
+    assert list(zip(*(columns["nodes"][f] for f in fields))) == [tuple(n.get(f) for f in fields) for n in data["nodes"]]
+    assert list(zip(columns["links"]["source"], columns["links"]["target"], columns["links"]["type"])) == [
+        (l["source"], l["target"], l["type"]) for l in data["links"]
+    ]
+    assert columns["total_nodes"] == data["total_nodes"]
+    assert columns["total_links"] == data["total_links"]
+
+
+def test_graph_ghost_nodes(graph):
+    data = graph.get_all_graph_data(user_id=U, view_type="strategic")
+    by_id = {n["id"]: n for n in data["nodes"]}
+    # 不在战略视图中、但有详情的邻居：无名称时标签为 Unknown
+    assert by_id["note_1"]["label"] == "Unknown"
+    assert by_id["note_1"]["content"] == "a note without any name"
+    # 查不到详情的邻居以 ID 占位
+    assert by_id["missing_node"] == {"id": "missing_node", "label": "missing_node", "group": 7, "type": "Concept (Linked)"}
+
+
+def test_ghost_lookup_is_chunked(store, monkeypatch):
+    from app.services.memory import graph_store as graph_store_module
+
+    monkeypatch.setattr(graph_store_module, "SQL_IN_CHUNK", 2)
+    populate(store, U)
+    data = store.get_all_graph_data(user_id=U, view_type="strategic")
+    columns = store.get_graph_columns(U, "strategic")
+    assert [n["label"] for n in data["nodes"] if "data" not in n] == ["missing_node", "Unknown", "chat", "Gamma"]
+    assert columns["nodes"]["label"][-4:] == ["missing_node", "Unknown", "chat", "Gamma"]
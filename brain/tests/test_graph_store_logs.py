@@ -0,0 +1,93 @@
+import pytest
+
+from app.services.memory import graph_store as graph_store_module
+from app.services.memory.graph_store import GraphStore
+
+U = "u1"
+
+
+def _log_ids(gs):
+    with gs._reader_conn(row=False) as conn:
+        return {r[0] for r in conn.execute("SELECT id FROM nodes WHERE user_id = ? AND type = 'Log'", (U,))}
+
+
+def test_log_writer_starts_lazily(store):
+    assert store._log_thread is None
+    assert store.add_log(U, "log_1", "hello", "2026-01-01")
+    assert store._log_thread is not None and store._log_thread.is_alive()
+    thread = store._log_thread
+    assert store.add_log(U, "log_2", "world", "2026-01-01")
+    assert store._log_thread is thread
+
+
+def test_queued_logs_visible_after_flush(store):
+    with store._lock:
+        # 持有写锁时后台线程无法落库，日志只在队列中
+        for i in range(5):
+            assert store.add_log(U, f"log_{i}", f"content {i}", "2026-01-01")
+        assert _log_ids(store) == set()
+    assert store.flush()
+    assert _log_ids(store) == {f"log_{i}" for i in range(5)}
+
+
+def test_sync_log_is_readable_immediately(store):
+    assert store.add_log(U, "log_sync", "now", "2026-01-01", sync=True)
+    assert _log_ids(store) == {"log_sync"}
+
+
+def test_full_queue_falls_back_to_sync_write(db_path, monkeypatch):
+    monkeypatch.setattr(graph_store_module, "LOG_QUEUE_SIZE", 2)
+    monkeypatch.setattr(graph_store_module, "LOG_BATCH_SIZE", 1)
+    gs = GraphStore(db_path=db_path)
+    try:
+        with gs._lock:
+            # 后台线程每批只取一条，取走后阻塞在写锁上，其余超出队列容量的日志在当前线程 (可重入) 同步写入
+            for i in range(6):
+                assert gs.add_log(U, f"log_{i}", "x", "2026-01-01")
+            assert len(_log_ids(gs)) >= 3
+        assert gs.flush()
+        assert _log_ids(gs) == {f"log_{i}" for i in range(6)}
+    finally:
+        gs.close()
+
+
+def test_failed_rows_reported_by_flush(store):
+    with store._lock:
+        assert store.add_log(U, "log_ok_1", "a", "2026-01-01")
+        # user_id 违反 NOT NULL：整批失败后逐行重试，其余日志照常落库
+        assert store.add_log(None, "log_bad", "b", "2026-01-01")
+        assert store.add_log(U, "log_ok_2", "c", "2026-01-01")
+    assert store.flush() is False
+    assert _log_ids(store) == {"log_ok_1", "log_ok_2"}
+    # 失败计数在 flush 后清零
+    assert store.flush() is True
+    assert store.add_log(None, "log_bad", "b", "2026-01-01", sync=True) is False
+
+
+def test_close_stops_background_threads(db_path):
+    gs = GraphStore(db_path=db_path)
+    gs.add_log(U, "log_1", "x", "2026-01-01")
+    threads = (gs._log_thread, gs._maintenance_thread)
+    assert gs.close()
+    assert not any(t.is_alive() for t in threads)
+
+
+def test_flush_under_write_lock_raises(store):
+    assert store.add_log(U, "log_1", "hello", "2026-01-01")
+    with store._lock:
+        with pytest.raises(RuntimeError):
+            store.flush()
+    assert store.flush()
+    assert _log_ids(store) == {"log_1"}
+
+
+def test_close_registered_at_exit_without_logs(db_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(graph_store_module.atexit, "register", registered.append)
+    monkeypatch.setattr(graph_store_module.atexit, "unregister", registered.remove)
+    gs = GraphStore(db_path)
+    # 从未写日志的实例同样在退出时关闭维护线程与写连接
+    assert registered == [gs.close]
+    assert gs.close()
+    assert registered == []
+    assert not gs._maintenance_thread.is_alive()
@@ -0,0 +1,108 @@
+import importlib.util
+import sqlite3
+
+import pytest
+
+from app.services.memory.graph_store import GraphStore, SCHEMA_VERSION, _legacy_stable_id
+
+U = "u1"
+TS = "2026-01-01 00:00:00"
+
+
+def _rows(db_path, sql, args=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, args).fetchall()
+    finally:
+        conn.close()
+
+
+def _node(nid, ntype, name, **extra):
+    return {"id": nid, "user_id": U, "type": ntype, "name": name, "content": "", "attributes": "{}", "created_at": TS, **extra}
+
+
+def _edge(source, target, relation, **extra):
+    return {"source": source, "target": target, "relation": relation, "user_id": U, "properties": "{}", "created_at": TS, **extra}
+
+
+def test_stable_ids_upgrade(legacy_db):
+    alpha, beta, delta = (_legacy_stable_id(n) for n in ("Alpha", "Beta", "Delta"))
+    path = legacy_db({
+        "nodes": [
+            _node(alpha, "Project", "Alpha"),
+            _node(beta, "Concept", "Beta"),
+            # con_ 前缀但并非由名称派生的 ID 保持原样
+            _node("con_custom", "Concept", "Gamma"),
+        ],
+        "edges": [_edge(alpha, beta, "HAS"), _edge("log_1", alpha, "MENTIONS")],
+        "staging_nodes": [_node(delta, "Task", "Delta")],
+        "staging_edges": [_edge(delta, alpha, "PART_OF")],
+    })
+    gs = GraphStore(db_path=path)
+    new_alpha, new_beta, new_delta = (gs._get_stable_id(n) for n in ("Alpha", "Beta", "Delta"))
+
+    assert _rows(path, "PRAGMA user_version")[0][0] == SCHEMA_VERSION
+    assert {r[0] for r in _rows(path, "SELECT id FROM nodes")} == {new_alpha, new_beta, "con_custom"}
+    assert set(_rows(path, "SELECT source, target, relation FROM edges")) == {
+        (new_alpha, new_beta, "HAS"), ("log_1", new_alpha, "MENTIONS"),
+    }
+    assert _rows(path, "SELECT id FROM staging_nodes") == [(new_delta,)]
+    # 暂存边只在暂存表内改写，指向正式库旧 ID 的一端同样按映射更新
+    assert _rows(path, "SELECT source, target FROM staging_edges") == [(new_delta, new_alpha)]
+
+    # 映射保留给向量库同步，清除后不再返回
+    renames = gs.get_pending_id_renames()
+    assert renames == {alpha: new_alpha, beta: new_beta, _legacy_stable_id("Delta"): new_delta}
+    assert gs.clear_id_renames(list(renames))
+    assert gs.get_pending_id_renames() == {}
+
+    # 再次打开已是最新版本，迁移不再执行
+    assert GraphStore(db_path=path).get_pending_id_renames() == {}
+
+
+def test_fresh_db_has_no_pending_renames(store):
+    assert store.get_pending_id_renames() == {}
+
+
+def test_heal_vision_nodes(legacy_db):
+    path = legacy_db({
+        "nodes": [
+            _node("vision_u1", "Vision", "V"),
+            _node("goal_1", "Goal", "G"),
+            _node("vis_a", "Vision", "Old"),
+            # u2 没有规范的 Vision 节点：最早写入的 vis_c 改名为 vision_u2，vis_b 被删除
+            _node("vis_c", "Vision", "C", user_id="u2"),
+            _node("vis_b", "Vision", "B", user_id="u2"),
+        ],
+        "edges": [
+            _edge("vision_u1", "goal_1", "HAS_GOAL"),
+            _edge("vis_a", "goal_1", "HAS_GOAL"),
+            _edge("vis_a", "goal_2", "DRIVES"),
+            _edge("u2", "vis_b", "OWNS", user_id="u2"),
+            _edge("u2", "vis_c", "OWNS", user_id="u2"),
+        ],
+        "staging_nodes": [_node("svis", "Vision", "S")],
+        "staging_edges": [_edge("s1", "svis", "SUPPORTS")],
+    })
+    GraphStore(db_path=path).close()
+
+    assert set(_rows(path, "SELECT id, user_id, name FROM nodes WHERE type = 'Vision'")) == {
+        ("vision_u1", "u1", "V"), ("vision_u2", "u2", "C"),
+    }
+    assert set(_rows(path, "SELECT source, target, relation, user_id FROM edges")) == {
+        ("vision_u1", "goal_1", "HAS_GOAL", "u1"),
+        ("vision_u1", "goal_2", "DRIVES", "u1"),
+        ("u2", "vision_u2", "OWNS", "u2"),
+    }
+    assert _rows(path, "SELECT id FROM staging_nodes") == [("vision_u1",)]
+    assert _rows(path, "SELECT source, target FROM staging_edges") == [("s1", "vision_u1")]
+
+
+def test_import_fails_on_old_sqlite(monkeypatch):
+    """SQLite 版本低于生成列所需的最低版本时，导入即报错而不是在建表时失败"""
+    from app.services.memory import graph_store
+
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", (3, 30, 1))
+    spec = importlib.util.spec_from_file_location("_graph_store_old_sqlite", graph_store.__file__)
+    with pytest.raises(RuntimeError, match="3.31.0"):
+        spec.loader.exec_module(importlib.util.module_from_spec(spec))
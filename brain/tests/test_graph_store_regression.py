@@ -0,0 +1,200 @@
+"""图谱 / 统计输出与迁移后状态的回归测试：逐项断言重写后必须保持的语义
+
+fixtures/legacy_rows.json 是旧版代码 (md5 稳定 ID、attributes 内嵌向量、带空格 JSON、遗留的不规范 Vision 节点)
+直接写出的原始行，作为迁移测试的输入。
+"""
+import json
+import sqlite3
+from array import array
+from pathlib import Path
+
+import pytest
+
+from app.services.memory.graph_store import (
+    GraphStore, SCHEMA_VERSION, _GRAPH_EDGE_QUERY, _GRAPH_FUSED_QUERIES, _GRAPH_NODE_QUERIES,
+)
+from conftest import populate
+
+FIXTURES = Path(__file__).parent / "fixtures"
+U = "u1"
+VIEWS = ("global", "strategic", "people", "staging")
+
+# populate() 写入后各视图的节点顺序 (标签)；ghost 为边另一端补全的邻居，按边顺序、先 target 后 source 排在视图节点之后
+VIEW_ORDER = {
+    # energy_impact DESC, created_at DESC
+    "global": (["Alice", "Acme", "Beta", "Alpha", "Bob", "a note without any n", "Delta", "Gamma", "chat", "m2", "m1", "V", "Me"],
+               ["missing_node"]),
+    # type_rank (Self -> Vision -> Goal -> Project -> Task), 同层 created_at DESC
+    "strategic": (["Me", "V", "m2", "m1", "Alpha", "Beta"], ["missing_node", "Unknown", "chat", "Gamma"]),
+    # Self 在前，其余按 energy_impact DESC
+    "people": (["Me", "Alice", "Acme", "Bob"], ["V"]),
+    # 暂存区按 created_at DESC
+    "staging": (["S2", "S1"], ["s_missing"]),
+}
+
+
+def _fixture(name):
+    return json.loads((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+def _split(graph):
+    """视图节点带 data 字段，补全的邻居 (ghost) 没有"""
+    view = [n["label"] for n in graph["nodes"] if "data" in n]
+    ghosts = [n["label"] for n in graph["nodes"] if "data" not in n]
+    return view, ghosts
+
+
+@pytest.fixture
+def graph(store):
+    return populate(store, U)
+
+
+@pytest.fixture
+def migrated(legacy_db):
+    gs = GraphStore(db_path=legacy_db(_fixture("legacy_rows.json")))
+    yield gs
+    gs.close()
+
+
+def test_entity_dossier_merge(store):
+    assert store.upsert_entities_batch(U, [
+        {"name": "X", "type": "Project", "content": "c", "dossier": {"tags": ["x", "y"], "k": 1, "s": "a"}},
+    ])
+    assert store.upsert_entities_batch(U, [
+        {"name": "X", "type": "Project", "dossier": {"tags": ["y", "z"], "k": 2, "j": "v", "s": ["b"]}},
+    ])
+    node = store.get_all_graph_data(user_id=U)["nodes"][0]
+    dossier = node["attributes"]["dossier"]
+    # 两边都是列表时取并集 (不重复)；其余键由新值覆盖；未给出 content 时保留原内容
+    assert sorted(dossier["tags"]) == ["x", "y", "z"] and len(dossier["tags"]) == 3
+    assert dossier["k"] == 2 and dossier["j"] == "v" and dossier["s"] == ["b"]
+    assert node["content"] == "c"
+
+
+@pytest.mark.parametrize("view", VIEWS)
+def test_view_order_and_ghosts(graph, view):
+    assert _split(graph.get_all_graph_data(user_id=U, view_type=view)) == VIEW_ORDER[view]
+
+
+def test_ghost_completion(graph):
+    nodes = {n["id"]: n for n in graph.get_all_graph_data(user_id=U, view_type="strategic")["nodes"]}
+    # 有详情的邻居：精简字段，无名称时标签为 Unknown
+    assert nodes["note_1"] == {
+        "id": "note_1", "label": "Unknown", "group": 7, "type": "Note",
+        "content": "a note without any name", "alignment_score": 0.5,
+    }
+    # 查不到详情的邻居以 ID 占位
+    assert nodes["missing_node"] == {"id": "missing_node", "label": "missing_node", "group": 7, "type": "Concept (Linked)"}
+    # people 视图中的 Vision 邻居保留其分组
+    vision = next(n for n in graph.get_all_graph_data(user_id=U, view_type="people")["nodes"] if n["id"] == "vision_u1")
+    assert vision["group"] == 2 and vision["type"] == "Vision"
+
+
+def test_staging_output(graph):
+    data = graph.get_all_graph_data(user_id=U, view_type="staging")
+    assert [(n["id"], n["type"], n["group"]) for n in data["nodes"]] == [
+        ("s2", "Project", 5), ("s1", "Concept", 7), ("s_missing", "Concept (Linked)", 7),
+    ]
+    assert [(l["source"], l["target"], l["type"]) for l in data["links"]] == [("s2", "s_missing", "R"), ("s1", "s2", "R")]
+    assert (data["total_nodes"], data["total_links"]) == (3, 2)
+
+
+def test_stats(graph):
+    assert graph.get_stats(user_id=U) == {
+        "node_counts": {
+            "total": 13, "Concept": 2, "Goal": 2, "Log": 1, "Note": 1, "Organization": 1,
+            "Person": 2, "Project": 1, "Self": 1, "Task": 1, "Vision": 1,
+        },
+        "relation_counts": {"total": 10},
+    }
+    assert graph.get_stats(user_id="nobody") == {"node_counts": {"total": 0}, "relation_counts": {"total": 0}}
+
+
+def test_legacy_db_graph(migrated):
+    legacy_ids = {r["id"] for r in _fixture("legacy_rows.json")["nodes"] if r["id"].startswith("con_")}
+    for view in VIEWS:
+        data = migrated.get_all_graph_data(user_id=U, view_type=view)
+        assert "error" not in data
+        ids = {n["id"] for n in data["nodes"]} | {l[k] for l in data["links"] for k in ("source", "target")}
+        assert not ids & legacy_ids, view
+
+    # 不规范的 vis_a 并入 vision_u1，其独有的边改挂到 vision_u1 上
+    strategic = migrated.get_all_graph_data(user_id=U, view_type="strategic")
+    assert _split(strategic)[0] == ["Me", "V", "m2", "m1", "Alpha", "Beta"]
+    assert ("vision_u1", migrated._get_stable_id("Alpha"), "DRIVES") in {
+        (l["source"], l["target"], l["type"]) for l in strategic["links"]
+    }
+    # 迁移后的概念节点 attributes 中不再带向量
+    gamma = next(n for n in migrated.get_all_graph_data(user_id=U)["nodes"] if n["label"] == "Gamma")
+    assert gamma["attributes"] == {}
+
+    # u2 只有两个不规范 Vision：最早写入的 C 改名为 vision_u2
+    u2 = migrated.get_all_graph_data(user_id="u2", view_type="strategic")
+    assert [(n["id"], n["label"]) for n in u2["nodes"]] == [("u2", "U2"), ("vision_u2", "C"), ("g2", "G2")]
+    assert {(l["source"], l["target"], l["type"]) for l in u2["links"]} == {
+        ("u2", "vision_u2", "OWNS"), ("vision_u2", "g2", "HAS_GOAL"),
+    }
+    assert migrated.get_stats(user_id="u2")["node_counts"] == {"total": 3, "Goal": 1, "Self": 1, "Vision": 1}
+
+
+def test_legacy_db_migrated_state(migrated):
+    conn = sqlite3.connect(migrated.db_path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+        # v1：名称派生的 ID 全部换成 blake2b 版本
+        assert conn.execute("SELECT COUNT(*) FROM nodes WHERE id = ?", (migrated._get_stable_id("Gamma"),)).fetchone()[0] == 1
+        legacy_ids = {r["id"] for r in _fixture("legacy_rows.json")["nodes"] if r["id"].startswith("con_")}
+        assert not legacy_ids & {r[0] for r in conn.execute("SELECT id FROM nodes")}
+        assert set(migrated.get_pending_id_renames()) == legacy_ids
+
+        # v2：概念向量移入 concept_vector BLOB，attributes 中不再保留
+        vector, attributes = conn.execute(
+            "SELECT concept_vector, attributes FROM nodes WHERE id = ?", (migrated._get_stable_id("Gamma"),)
+        ).fetchone()
+        assert vector == array('f', [0.5, 0.25]).tobytes()
+        assert attributes == "{}"
+
+        # v3：JSON 文本统一为紧凑格式
+        for table, column in (("nodes", "attributes"), ("staging_nodes", "attributes"),
+                              ("edges", "properties"), ("staging_edges", "properties")):
+            assert conn.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE json_valid({column}) AND {column} != json({column})"
+            ).fetchone()[0] == 0, table
+
+        # v4：type_rank 生成列按层级取值
+        assert "type_rank" in {r[1] for r in conn.execute("PRAGMA table_xinfo(nodes)")}
+        ranks = dict(conn.execute("SELECT DISTINCT type, type_rank FROM nodes"))
+        assert ranks["Self"] == 0 and ranks["Vision"] == 1 and ranks["Goal"] == 2
+        assert ranks["Project"] == 3 and ranks["Task"] == 4 and ranks["Person"] == 6
+
+        # 不规范的 Vision 节点已合并
+        assert conn.execute("SELECT COUNT(*) FROM nodes WHERE type = 'Vision' AND id NOT LIKE 'vision^_%' ESCAPE '^'").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("view", VIEWS)
+def test_fused_query_matches_separate_queries(graph, view):
+    node_query, _, edge_table = _GRAPH_NODE_QUERIES[view]
+    with graph._reader_conn(row=False) as conn:
+        fused = conn.execute(_GRAPH_FUSED_QUERIES[view], (U,) * 3).fetchall()
+        nodes = conn.execute(node_query, (U,)).fetchall()
+        ids = [r[0] for r in nodes]
+        placeholders = ",".join("?" * len(ids))
+        edges = conn.execute(
+            _GRAPH_EDGE_QUERY.format(edge_table=edge_table, ids=placeholders), [U, *ids, U, *ids]
+        ).fetchall()
+    assert nodes
+    assert [r[1:10] for r in fused if r[0] == 'N'] == nodes
+    assert [r[10:] for r in fused if r[0] == 'E'] == edges
+
+
+def test_fused_query_without_materialized_hint(graph):
+    """SQLite < 3.35 不支持 MATERIALIZED 提示：去掉后融合查询结果不变"""
+    for view in VIEWS:
+        query = _GRAPH_FUSED_QUERIES[view]
+        assert "MATERIALIZED" in query
+        with graph._reader_conn(row=False) as conn:
+            assert conn.execute(query.replace("MATERIALIZED ", ""), (U,) * 3).fetchall() == \
+                conn.execute(query, (U,) * 3).fetchall()